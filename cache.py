@@ -0,0 +1,421 @@
+# File: cache.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the Cache object, which lets the simulator be configured
+#   and driven from other Python code without any prompts or prints
+
+from array import array
+from collections import namedtuple
+from replacement import REPLACEMENT_CLASSES, REPLACEMENT_POLICIES
+
+# What a single cache-read or cache-write did. Addresses, tags and data are integers,
+#  and -1 marks a field that does not apply (e.g. the eviction line of a hit)
+AccessResult = namedtuple('AccessResult', ['set', 'tag', 'hit', 'evictionLine',
+                                           'ramAddress', 'data', 'dirtyBit'])
+
+# Running totals of a cache
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'evictions', 'writeBacks'])
+
+WRITE_HIT_POLICIES = ['write_through', 'write_back']
+WRITE_MISS_POLICIES = ['write_allocate', 'no_write_allocate']
+
+def policyName(policy, policies):
+    ##
+    # Converts a policy given either by menu number or by name to its name
+    # @param Policy - number (1-based) or name
+    # @param Policies - list of policy names in menu order
+    # @returns The name of the policy
+
+    if isinstance(policy, str):
+        if policy not in policies:
+            raise ValueError('policy must be one of {}'.format(', '.join(policies)))
+        return policy
+
+    if policy < 1 or policy > len(policies):
+        raise ValueError('policy must be between 1 and {}'.format(len(policies)))
+
+    return policies[policy-1]
+
+class Cache:
+    ##
+    # A single cache in front of a Memory. Policies may be given by menu number or by name.
+    # Line metadata is kept in parallel arrays and all line data in one bytearray,
+    #  with line number (set index * associativity + way) indexing every one of them
+
+    def __init__(self, memory, cacheSize, blockSize, associativity,
+                 replacementPolicy='least_recently_used', writeHitPolicy='write_back',
+                 writeMissPolicy='write_allocate', addressWidth=8, replacementOptions=None):
+        ##
+        # Configures a cold cache
+        # @param Memory - the Memory the cache reads from and writes to
+        # @param CacheSize - in bytes
+        # @param BlockSize - in bytes
+        # @param Associativity - 0 for fully associative
+        # @param ReplacementPolicy
+        # @param WriteHitPolicy
+        # @param WriteMissPolicy
+        # @param AddressWidth - number of bits in an address, at most 64
+        # @param ReplacementOptions - dict of extra arguments for the replacement policy,
+        #  e.g. {'tieBreak' : 'oldest', 'aging' : 1024} for least_frequently_used or
+        #  {'throttle' : 64} for bimodal_rrip
+
+        if cacheSize < 1 or cacheSize & (cacheSize - 1):
+            raise ValueError('Size of cache must be a power of two')
+        if blockSize < 1 or blockSize & (blockSize - 1):
+            raise ValueError('block size must be a power of two')
+        if blockSize > cacheSize:
+            raise ValueError('the block size cannot be bigger than the cache itself.')
+
+        # An associativity of 0 puts every line in one set
+        if associativity == 0:
+            associativity = cacheSize // blockSize
+        if associativity < 1 or associativity & (associativity - 1) or associativity > cacheSize // blockSize:
+            raise ValueError('associativity must be a power of two no bigger than the number of lines')
+
+        self.memory = memory
+        self.cacheSize = cacheSize
+        self.blockSize = blockSize
+        self.associativity = associativity
+        self.numberOfSets = cacheSize // blockSize // associativity
+        self.addressWidth = addressWidth
+
+        # Work out the address split once so decoding is just shifts and masks
+        self.numberOfOffsetBits = blockSize.bit_length() - 1
+        self.numberOfSetBits = self.numberOfSets.bit_length() - 1
+        self.numberOfTagBits = addressWidth - self.numberOfSetBits - self.numberOfOffsetBits
+        if addressWidth > 64 or self.numberOfTagBits < 0:
+            raise ValueError('address width must be at most 64 bits and hold the set and offset bits')
+        self.offsetMask = blockSize - 1
+        self.setMask = self.numberOfSets - 1
+        self.tagShift = self.numberOfOffsetBits + self.numberOfSetBits
+        self.addressMask = (1 << addressWidth) - 1
+
+        # Hex digits used to print tags and addresses
+        self.tagDigits = max(2, (self.numberOfTagBits + 3) // 4)
+        self.addressDigits = max(2, (addressWidth + 3) // 4)
+        self.replacementPolicy = policyName(replacementPolicy, REPLACEMENT_POLICIES)
+        self.writeHitPolicy = policyName(writeHitPolicy, WRITE_HIT_POLICIES)
+        self.writeMissPolicy = policyName(writeMissPolicy, WRITE_MISS_POLICIES)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writeBacks = 0
+
+        numberOfLines = self.numberOfSets * associativity
+
+        self.valid = bytearray(numberOfLines)
+        self.dirty = bytearray(numberOfLines)
+        self.tags = array('Q', bytes(8 * numberOfLines))
+        # The block address that brought each line into the cache
+        self.addressUsed = array('Q', bytes(8 * numberOfLines))
+        self.data = bytearray(numberOfLines * blockSize)
+        self.dataView = memoryview(self.data)
+
+        # Hash index of the cached blocks: block number (address without its offset bits) -> line.
+        #  The block number holds both the set index and the tag, so one lookup finds a hit
+        #  however many ways a set has
+        self.index = {}
+
+        # A flush starts a new generation with an empty index instead of touching any line.
+        #  A set left from an older generation is emptied the next time it allocates a line
+        self.generation = 0
+        self.setGeneration = array('Q', bytes(8 * self.numberOfSets))
+
+        # Write the dirty lines back to the RAM on a flush instead of dropping them
+        self.writeBackOnFlush = False
+
+        # Pick the replacement policy once instead of on every miss
+        self.policy = REPLACEMENT_CLASSES[self.replacementPolicy](self.numberOfSets, associativity, self.valid,
+                                                                  **(replacementOptions or {}))
+
+    def renewSet(self, setIndex):
+        ##
+        # Empties a set left from before a flush, making its lines cold
+        # @param SetIndex
+        # @returns None
+
+        associativity = self.associativity
+        first = setIndex * associativity
+        last = first + associativity
+
+        self.valid[first:last] = bytes(associativity)
+        self.dirty[first:last] = bytes(associativity)
+        self.tags[first:last] = array('Q', bytes(8 * associativity))
+        self.addressUsed[first:last] = array('Q', bytes(8 * associativity))
+        self.data[first * self.blockSize:last * self.blockSize] = bytes(associativity * self.blockSize)
+        self.policy.resetSet(setIndex)
+        self.setGeneration[setIndex] = self.generation
+
+    def renewSets(self):
+        ##
+        # Empties every set left from before a flush, so the lines can be read directly
+        # @returns None
+
+        generation = self.generation
+
+        for setIndex, setGeneration in enumerate(self.setGeneration):
+            if setGeneration != generation:
+                self.renewSet(setIndex)
+
+    def expandAddress(self, address):
+        ##
+        # Breaks down an address into the three parts neccessary for the cache
+        # @param Address - as an integer
+        # @returns Tag, set index, and block offset as integers
+
+        if address < 0 or address > self.addressMask:
+            raise ValueError('address 0x{:X} does not fit in {} bits'.format(address, self.addressWidth))
+
+        return (address >> self.tagShift,
+                (address >> self.numberOfOffsetBits) & self.setMask,
+                address & self.offsetMask)
+
+    def read(self, address):
+        ##
+        # Attempt to read data from cache. If miss, use replacement method
+        # @param Address - as an integer
+        # @returns AccessResult of the cache-read
+
+        tag, setIndex, blockOffset = self.expandAddress(address)
+
+        line = self.index.get(address >> self.numberOfOffsetBits, -1)
+
+        if line >= 0:
+            self.hits += 1
+
+            # Let the replacement policy know the line was used
+            self.policy.touch(line)
+
+            return AccessResult(setIndex, tag, True, -1, -1,
+                                self.data[line * self.blockSize + blockOffset], -1)
+
+        self.misses += 1
+
+        line = self.replace(tag, setIndex, address)
+
+        return AccessResult(setIndex, tag, False, line - setIndex * self.associativity, address,
+                            self.data[line * self.blockSize + blockOffset], -1)
+
+    def write(self, address, byte):
+        ##
+        # Either writes the byte to cache and RAM or just RAM depending on policies
+        # @param Address - as an integer
+        # @param Byte - as an integer
+        # @returns AccessResult of the cache-write
+
+        tag, setIndex, blockOffset = self.expandAddress(address)
+
+        line = self.index.get(address >> self.numberOfOffsetBits, -1)
+
+        if line >= 0:
+            self.hits += 1
+            self.writeLine(line, address, blockOffset, byte)
+
+            return AccessResult(setIndex, tag, True, -1, address, byte, self.dirty[line])
+
+        self.misses += 1
+
+        # With no_write_allocate the byte only goes to the RAM
+        if self.writeMissPolicy == 'no_write_allocate':
+            self.memory.write(address, byte)
+
+            return AccessResult(setIndex, tag, False, -1, address, byte, -1)
+
+        line = self.replace(tag, setIndex, address)
+        self.writeLine(line, address, blockOffset, byte)
+
+        return AccessResult(setIndex, tag, False, line - setIndex * self.associativity, address,
+                            byte, self.dirty[line])
+
+    def writeLine(self, line, address, blockOffset, byte):
+        ##
+        # Writes the byte into a line, and through to the RAM or setting the dirty bit
+        # @param Line - line number
+        # @param Address - of the byte
+        # @param BlockOffset
+        # @param Byte
+        # @returns None
+
+        self.data[line * self.blockSize + blockOffset] = byte
+
+        if self.writeHitPolicy == 'write_through':
+            self.memory.write(address, byte)
+        else:
+            self.dirty[line] = 1
+
+    def evictLine(self, line):
+        ##
+        # Takes the block out of a valid line, writing it back to the RAM first if it is dirty
+        # @param Line - line number
+        # @returns None
+
+        blockSize = self.blockSize
+        start = line * blockSize
+
+        self.evictions += 1
+        del self.index[self.addressUsed[line] >> self.numberOfOffsetBits]
+
+        # Write the old block back to ram if its dirty bit is set
+        if self.dirty[line]:
+            self.memory.writeBlock(self.addressUsed[line], self.dataView[start:start + blockSize])
+            self.writeBacks += 1
+
+    def fillLine(self, line, tag, address, data=None):
+        ##
+        # Replaces whatever is in the line with the block holding address
+        # @param Line - line number
+        # @param Tag
+        # @param Address - any address inside the new block
+        # @param Data - the whole new block, read from the RAM by default
+        # @returns None
+
+        blockSize = self.blockSize
+        start = line * blockSize
+
+        if self.valid[line]:
+            self.evictLine(line)
+
+        blockAddress = address - address % blockSize
+
+        self.valid[line] = 1
+        self.dirty[line] = 0
+        self.tags[line] = tag
+        self.addressUsed[line] = blockAddress
+        self.index[address >> self.numberOfOffsetBits] = line
+        self.data[start:start + blockSize] = self.memory.readBlock(blockAddress, blockSize) if data is None else data
+
+    def replace(self, tag, setIndex, address, data=None):
+        ##
+        # Fills the line the replacement policy picks with the block holding address
+        # @param Tag
+        # @param SetIndex
+        # @param Address - address of the access that missed
+        # @param Data - the whole new block, read from the RAM by default
+        # @returns The line number replaced
+
+        if self.setGeneration[setIndex] != self.generation:
+            self.renewSet(setIndex)
+
+        line = self.policy.victim(setIndex, tag)
+
+        self.fillLine(line, tag, address, data)
+        self.policy.fill(line)
+
+        return line
+
+    def fetch(self, address):
+        ##
+        # Instruction fetches are reads to a cache that holds both instructions and data
+        # @param Address - as an integer
+        # @returns AccessResult of the cache-read
+
+        return self.read(address)
+
+    def readBlock(self, address, size):
+        ##
+        # Reads a block through the cache, so a cache can be the memory of the level above it.
+        #  Counts as one access
+        # @param Address - of the first byte, inside one of this cache's blocks
+        # @param Size - in bytes, at most the block size
+        # @returns The bytes
+
+        tag, setIndex, blockOffset = self.expandAddress(address)
+
+        line = self.index.get(address >> self.numberOfOffsetBits, -1)
+
+        if line >= 0:
+            self.hits += 1
+            self.policy.touch(line)
+        else:
+            self.misses += 1
+            line = self.replace(tag, setIndex, address)
+
+        start = line * self.blockSize + blockOffset
+
+        return self.data[start:start + size]
+
+    def writeBlock(self, address, data):
+        ##
+        # Writes a block (a write back from the level above) through the cache under its
+        #  write policies. Counts as one access
+        # @param Address - of the first byte, inside one of this cache's blocks
+        # @param Data - bytes, at most the block size
+        # @returns None
+
+        tag, setIndex, blockOffset = self.expandAddress(address)
+
+        line = self.index.get(address >> self.numberOfOffsetBits, -1)
+
+        if line >= 0:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+            if self.writeMissPolicy == 'no_write_allocate':
+                self.memory.writeBlock(address, data)
+                return
+
+            # A whole block does not need reading first
+            line = self.replace(tag, setIndex, address, data if len(data) == self.blockSize else None)
+
+        start = line * self.blockSize + blockOffset
+        self.data[start:start + len(data)] = data
+
+        if self.writeHitPolicy == 'write_through':
+            self.memory.writeBlock(address, data)
+        else:
+            self.dirty[line] = 1
+
+    def flush(self, writeBack=None):
+        ##
+        # Makes the cache cold again, keeping its policies and statistics. Only the index is
+        #  replaced, so it takes the same time however big the cache is
+        # @param WriteBack - write the dirty lines back to the RAM first, writeBackOnFlush by default
+        # @returns None
+
+        if writeBack is None:
+            writeBack = self.writeBackOnFlush
+
+        if writeBack:
+            self.writeBackDirty()
+
+        self.generation += 1
+        self.index = {}
+
+    def writeBackDirty(self):
+        ##
+        # Writes every dirty line back to the RAM, leaving it clean and cached
+        # @returns None
+
+        blockSize = self.blockSize
+
+        # Writing a block to the level below may take lines out of this one
+        #  (back-invalidation), so walk a copy and skip the lines already gone
+        for block, line in list(self.index.items()):
+            if self.dirty[line] and self.index.get(block) == line:
+                start = line * blockSize
+                self.memory.writeBlock(self.addressUsed[line], self.dataView[start:start + blockSize])
+                self.dirty[line] = 0
+                self.writeBacks += 1
+
+    def stats(self):
+        ##
+        # @returns CacheStats with the running totals of the cache
+
+        return CacheStats(self.hits, self.misses, self.evictions, self.writeBacks)
+
+    def lines(self):
+        ##
+        # Walks every line of the cache in set order
+        # @returns Generator of (valid bit, dirty bit, tag, data bytes) per line
+
+        blockSize = self.blockSize
+        self.renewSets()
+
+        for line in range(self.numberOfSets * self.associativity):
+            yield (self.valid[line], self.dirty[line], self.tags[line],
+                   self.data[line * blockSize:(line + 1) * blockSize])
@@ -8,20 +8,418 @@
 
 
 from functions import *
+from memory import MEMORY_FORMATS
+from replacement import LFU_TIE_BREAKS
+from cache import policyName, WRITE_HIT_POLICIES, WRITE_MISS_POLICIES
+from vectorized import readTraceArrays, simulateDirectMapped
+from stackdistance import traceMissRatioCurve
+from sharded import simulateSharded
+from hierarchy import Hierarchy, INCLUSION_POLICIES
+from coherence import Multiprocessor, COHERENCE_PROTOCOLS
+from eventlog import openEventSink, EVENT_LEVELS, EVENT_FORMATS
+from checkpoint import loadCheckpoint, runCheckpointed
+from missclassifier import MissClassifier
+from timeseries import TimeSeries, openSeriesWriter, SERIES_FORMATS
+from profiler import profileTrace
 from copy import deepcopy
+import argparse
+
+def levelOptions(text):
+    ##
+    # Reads one --level of a hierarchy
+    # @param Text - 'size,block size,associativity' optionally followed by
+    #  ',replacement policy,write hit policy,write miss policy' (numbers or names)
+    # @returns Dict of LevelCache arguments
+    
+    fields = text.split(',')
+    
+    if len(fields) != 3 and len(fields) != 6:
+        raise argparse.ArgumentTypeError('a level is size,block,associativity[,replacement,hit,miss]')
+    
+    options = {'cacheSize' : int(fields[0]), 'blockSize' : int(fields[1]), 'associativity' : int(fields[2])}
+    
+    for name, policy in zip(['replacementPolicy', 'writeHitPolicy', 'writeMissPolicy'], fields[3:]):
+        options[name] = int(policy) if policy.isdigit() else policy
+    
+    return options
+
+def parseArguments():
+    ##
+    # Reads the command line. The input text file is the only required argument;
+    #  passing --trace switches the simulator to batch mode
+    # @param None
+    # @returns Parsed arguments
+    
+    parser = argparse.ArgumentParser(description='Cache simulator')
+    parser.add_argument('memory', help='memory image: text file with one byte in hex per line, '
+                                       '.bin raw binary or .hex Intel HEX')
+    parser.add_argument('--memory-map', action='store_true',
+                        help='map the raw binary memory image instead of loading it; changes persist to the file')
+    parser.add_argument('--flush-write-back', action='store_true',
+                        help='write dirty lines back to the RAM on cache-flush instead of dropping them')
+    
+    # Batch mode parameters mirror the interactive configuration prompts
+    batch = parser.add_argument_group('batch mode')
+    batch.add_argument('--trace', help="replay this trace file instead of reading commands, '-' for the "
+                       'standard input. gzip, bzip2 and xz traces are decompressed on the fly')
+    batch.add_argument('--prefetch', action='store_true',
+                       help='read and decompress the trace on a background thread while simulating')
+    batch.add_argument('--cache-size', type=int, default=32)
+    batch.add_argument('--block-size', type=int, default=8)
+    batch.add_argument('--associativity', type=int, default=1)
+    batch.add_argument('--replacement-policy', type=int, default=1,
+                       help='1 random_replacement, 2 least_recently_used, 3 least_frequently_used, '
+                            '4 tree_pseudo_lru, 5 static_rrip, 6 bimodal_rrip, 7 dynamic_rrip, '
+                            '8 adaptive_replacement')
+    batch.add_argument('--seed', type=int,
+                       help='give every set its own random replacement generator seeded from this')
+    batch.add_argument('--lfu-tie-break', choices=LFU_TIE_BREAKS,
+                       help='which least frequently used line to evict on a tie (way by default)')
+    batch.add_argument('--lfu-aging', type=int, default=0,
+                       help='halve a set\'s frequencies every this many uses of the set')
+    batch.add_argument('--write-hit-policy', type=int, default=1,
+                       help='1 write_through, 2 write_back')
+    batch.add_argument('--write-miss-policy', type=int, default=1,
+                       help='1 write_allocate, 2 no_write_allocate')
+    batch.add_argument('--address-width', type=int, default=8,
+                       help='number of bits in an address, e.g. 16, 32, 48 or 64')
+    batch.add_argument('--memory-size', type=int, default=256, help='RAM size in bytes')
+    batch.add_argument('--sparse-memory', action='store_true',
+                       help='allocate RAM pages on first write across the whole address width')
+    batch.add_argument('--page-size', type=int, default=4096, help='sparse RAM page size in bytes')
+    batch.add_argument('--memory-format', choices=MEMORY_FORMATS,
+                       help='memory image format, guessed from the extension by default')
+    batch.add_argument('--vectorized', action='store_true',
+                       help='count a direct-mapped trace with NumPy instead of replaying it')
+    batch.add_argument('--shards', type=int, default=1,
+                       help='split the sets between this many processes; the totals do not change')
+    batch.add_argument('--level', type=levelOptions, action='append',
+                       help='add a hierarchy level, first level first: size,block,associativity'
+                            '[,replacement,hit,miss]; replaces the single cache options')
+    batch.add_argument('--instruction-cache', type=levelOptions,
+                       help='split the first level, with this instruction cache for fetches')
+    batch.add_argument('--inclusion', choices=INCLUSION_POLICIES, default='non_inclusive',
+                       help='how each level relates to the levels above it')
+    batch.add_argument('--cores', type=int, default=1,
+                       help='give each of this many cores a private write-back cache kept coherent by --protocol')
+    batch.add_argument('--protocol', choices=COHERENCE_PROTOCOLS, default='MESI')
+    batch.add_argument('--miss-ratio-curve', action='store_true',
+                       help='print the least recently used miss ratio of every cache size up to --cache-size')
+    batch.add_argument('--profile', action='store_true',
+                       help='print the reuse distances, working sets and hottest blocks and sets of the trace '
+                            'for the --block-size, --cache-size and --associativity geometry')
+    batch.add_argument('--profile-window', type=int, default=10000, help='accesses in the sliding working set window, whose mean and peak are printed '
+                            'for every stretch of that many accesses')
+    batch.add_argument('--profile-top', type=int, default=10, help='number of hot blocks and sets to print')
+    batch.add_argument('--profile-max-blocks', type=int, default=1 << 20,
+                       help='distinct blocks tracked exactly before the profile switches to sketches')
+    batch.add_argument('--events', choices=EVENT_LEVELS, default='summary',
+                       help='record nothing, only the final summary, every --event-sample-th access or every access')
+    batch.add_argument('--event-log', default='-', help='file to record the accesses in, the console by default')
+    batch.add_argument('--event-format', choices=EVENT_FORMATS,
+                       help='binary for .bin logs, jsonl for .jsonl logs and the menu text otherwise by default')
+    batch.add_argument('--event-sample', type=int, default=1000,
+                       help='record every this many accesses with --events sampled')
+    batch.add_argument('--series', help='write the hit rate, miss rate, evictions, write backs and RAM traffic '
+                       'of every --series-window accesses to this file')
+    batch.add_argument('--series-window', type=int, default=10000, help='accesses per time series window')
+    batch.add_argument('--series-format', choices=SERIES_FORMATS,
+                       help='columnar for .col files and CSV otherwise by default')
+    batch.add_argument('--classify-misses', action='store_true',
+                       help='split the misses into compulsory, capacity and conflict misses, overall and per set')
+    batch.add_argument('--checkpoint', help='save the cache, RAM and trace position to this file at the end')
+    batch.add_argument('--checkpoint-every', type=int, default=0,
+                       help='also save the checkpoint every this many accesses')
+    batch.add_argument('--restore', help='carry on from this checkpoint instead of a cold cache, '
+                       'ignoring the cache and RAM options')
+    batch.add_argument('--trace-start', type=int,
+                       help='number of the first trace access to replay, the restored position by default')
+    batch.add_argument('--trace-stop', type=int, help='number of the trace access to stop before')
+    
+    return parser.parse_args()
+
+def openEvents(arguments, cache):
+    ##
+    # Opens the event log the arguments ask for
+    # @param Arguments - parsed command line arguments
+    # @param Cache - whose digits the text format uses
+    # @returns EventSink, or None when no access is recorded
+    
+    if arguments.events == 'full':
+        period = 1
+    elif arguments.events == 'sampled':
+        period = arguments.event_sample
+    else:
+        return None
+    
+    return openEventSink(arguments.event_log, arguments.event_format, period, cache.tagDigits, cache.addressDigits)
+
+def openSeries(arguments, caches, memory, start=0):
+    ##
+    # Opens the time series the arguments ask for
+    # @param Arguments - parsed command line arguments
+    # @param Caches - the caches whose statistics to sum
+    # @param Memory - the RAM under them
+    # @param Start - number of trace accesses already replayed
+    # @returns TimeSeries, or None without --series
+    
+    if not arguments.series:
+        return None
+    
+    try:
+        return TimeSeries(caches, memory, arguments.series_window,
+                          openSeriesWriter(arguments.series, arguments.series_format), start)
+    except (OSError, ValueError) as error:
+        raise SystemExit('Error, {}'.format(error))
+
+def runBatch(arguments):
+    ##
+    # Replays a whole trace without menus, recording the accesses --events asks for, then
+    #  prints the summary unless --events is none
+    # @param Arguments - parsed command line arguments
+    # @returns None
+    
+    summary = arguments.events != 'none'
+    
+    # The engines that do not replay accesses one at a time have none to record
+    if arguments.events in ('sampled', 'full') and (arguments.vectorized or arguments.shards > 1
+                                                  or arguments.miss_ratio_curve or arguments.profile):
+        raise SystemExit('Error, --events {} needs a replay one access at a time'.format(arguments.events))
+    if arguments.event_sample < 1:
+        raise SystemExit('Error, the event sample period must be at least 1')
+    if arguments.series and (arguments.vectorized or arguments.shards > 1
+                             or arguments.miss_ratio_curve or arguments.profile):
+        raise SystemExit('Error, --series needs a replay one access at a time')
+    if arguments.series_window < 1:
+        raise SystemExit('Error, the series window must be at least 1 access')
+    
+    # Only a single cache can be checkpointed, replay part of a trace or classify its misses
+    singleCache = not (arguments.vectorized or arguments.shards > 1 or arguments.level or arguments.cores > 1
+                       or arguments.miss_ratio_curve or arguments.profile)
+    partial = arguments.trace_start is not None or arguments.trace_stop is not None
+    if (arguments.checkpoint or arguments.restore or partial) and not singleCache:
+        raise SystemExit('Error, checkpoints and partial traces need a single cache')
+    if arguments.classify_misses and (arguments.checkpoint or arguments.restore):
+        raise SystemExit('Error, classified misses cannot be checkpointed')
+    if arguments.classify_misses and not singleCache:
+        raise SystemExit('Error, misses can only be classified for a single cache')
+    if arguments.checkpoint_every < 0:
+        raise SystemExit('Error, the checkpoint period cannot be negative')
+    
+    # A checkpoint brings its own cache and RAM
+    if arguments.restore:
+        try:
+            cache, position = loadCheckpoint(arguments.restore)
+        except (OSError, ValueError) as error:
+            raise SystemExit('Error, {}'.format(error))
+        replaySingle(cache, arguments, position)
+        return
+    
+    # One pass over the trace covers every cache size
+    if arguments.miss_ratio_curve:
+        try:
+            curve = traceMissRatioCurve(arguments.trace, arguments.block_size, arguments.associativity,
+                                        arguments.cache_size)
+        except ValueError as error:
+            raise SystemExit('Error, {}'.format(error))
+        for point in curve:
+            print('cache_size:{} misses:{} miss_ratio:{:.6f}'.format(*point))
+        return
+    
+    # The profile only looks at the trace
+    if arguments.profile:
+        numberOfSets = 1
+        if arguments.associativity and arguments.block_size > 0:
+            numberOfSets = max(1, arguments.cache_size // arguments.block_size // arguments.associativity)
+        try:
+            profile = profileTrace(arguments.trace, arguments.block_size, numberOfSets, arguments.profile_window,
+                                   arguments.profile_top, arguments.profile_max_blocks)
+        except ValueError as error:
+            raise SystemExit('Error, {}'.format(error))
+        printProfile(profile, arguments.block_size)
+        return
+    
+    # Direct-mapped counts can be worked out for the whole trace at once
+    if arguments.vectorized:
+        if arguments.associativity != 1:
+            raise SystemExit('Error, the vectorized engine only handles direct-mapped caches')
+        try:
+            addresses, writes = readTraceArrays(arguments.trace)
+            stats = simulateDirectMapped(addresses, writes, arguments.cache_size, arguments.block_size,
+                                         policyName(arguments.write_hit_policy, WRITE_HIT_POLICIES),
+                                         policyName(arguments.write_miss_policy, WRITE_MISS_POLICIES))
+        except (ImportError, ValueError) as error:
+            raise SystemExit('Error, {}'.format(error))
+        if summary:
+            printSummary(stats)
+        return
+    
+    try:
+        if arguments.memory_map:
+            RAM = MappedMemory(arguments.memory)
+        elif arguments.sparse_memory:
+            RAM = SparseMemory(arguments.memory, size=1 << arguments.address_width,
+                               fileFormat=arguments.memory_format, pageSize=arguments.page_size)
+        else:
+            RAM = Memory(arguments.memory, size=arguments.memory_size, fileFormat=arguments.memory_format)
+    except ValueError as error:
+        raise SystemExit('Error, {}'.format(error))
+    
+    # Options only the least frequently used policy takes
+    replacementOptions = {}
+    if arguments.lfu_tie_break is not None:
+        replacementOptions['tieBreak'] = arguments.lfu_tie_break
+    if arguments.lfu_aging:
+        replacementOptions['aging'] = arguments.lfu_aging
+    
+    # Only random replacement draws numbers
+    if arguments.seed is not None and arguments.replacement_policy == 1:
+        replacementOptions['seed'] = arguments.seed
+    
+    # Private caches on a snooping bus replace the single cache
+    if arguments.cores > 1:
+        try:
+            multiprocessor = Multiprocessor(RAM, arguments.cores, arguments.cache_size, arguments.block_size,
+                                            arguments.associativity, arguments.replacement_policy,
+                                            arguments.protocol, arguments.address_width, replacementOptions)
+        except ValueError as error:
+            raise SystemExit('Error, {}'.format(error))
+        for cache in multiprocessor.caches:
+            cache.writeBackOnFlush = arguments.flush_write_back
+        series = openSeries(arguments, multiprocessor.caches, RAM)
+        sink = openEvents(arguments, multiprocessor.caches[0])
+        position = None
+        try:
+            position = runCoreTrace(multiprocessor, arguments.trace, arguments.prefetch, sink, series)
+        except (ValueError, IndexError) as error:
+            raise SystemExit('Error, {}'.format(error))
+        finally:
+            if sink is not None:
+                sink.close()
+            if series is not None:
+                series.close(position)
+        if summary:
+            printCoreSummary(multiprocessor)
+        return
+    
+    # A hierarchy replaces the single cache
+    if arguments.level:
+        try:
+            hierarchy = Hierarchy(RAM, arguments.level, arguments.instruction_cache, arguments.inclusion,
+                                  arguments.address_width)
+        except ValueError as error:
+            raise SystemExit('Error, {}'.format(error))
+        for level in hierarchy.levels:
+            level.writeBackOnFlush = arguments.flush_write_back
+        # The series follows the first level, data and instruction caches together
+        firstLevel = [hierarchy.dataCache]
+        if hierarchy.instructionCache is not hierarchy.dataCache:
+            firstLevel.append(hierarchy.instructionCache)
+        series = openSeries(arguments, firstLevel, RAM)
+        sink = openEvents(arguments, hierarchy.dataCache)
+        position = None
+        try:
+            position = runTrace(hierarchy, arguments.trace, arguments.prefetch, sink, series=series)
+        except (ValueError, IndexError) as error:
+            raise SystemExit('Error, {}'.format(error))
+        finally:
+            if sink is not None:
+                sink.close()
+            if series is not None:
+                series.close(position)
+        if summary:
+            printHierarchySummary(hierarchy)
+        return
+    
+    # Sharded runs give each process its own copy of a flat RAM
+    if arguments.shards > 1:
+        if arguments.sparse_memory:
+            raise SystemExit('Error, sharded runs need a flat RAM')
+        try:
+            stats = simulateSharded(RAM, arguments.trace, arguments.cache_size, arguments.block_size,
+                                    arguments.associativity, arguments.replacement_policy,
+                                    arguments.write_hit_policy, arguments.write_miss_policy,
+                                    arguments.address_width, replacementOptions, arguments.shards,
+                                    arguments.seed or 0, arguments.flush_write_back)
+        except ValueError as error:
+            raise SystemExit('Error, {}'.format(error))
+        if summary:
+            printSummary(stats)
+        return
+    
+    try:
+        cache = Cache(RAM, arguments.cache_size, arguments.block_size, arguments.associativity,
+                      arguments.replacement_policy, arguments.write_hit_policy,
+                      arguments.write_miss_policy, arguments.address_width, replacementOptions)
+    except ValueError as error:
+        raise SystemExit('Error, {}'.format(error))
+    
+    replaySingle(cache, arguments)
+
+def replaySingle(cache, arguments, position=0):
+    ##
+    # Replays the trace through a single cache, checkpointing it if asked, then prints the summary
+    # @param Cache
+    # @param Arguments - parsed command line arguments
+    # @param Position - number of trace accesses the cache has already seen
+    # @returns None
+    
+    start = position if arguments.trace_start is None else arguments.trace_start
+    
+    # A restored cache keeps writing back on flush if it did when it was saved
+    if arguments.flush_write_back:
+        cache.writeBackOnFlush = True
+    
+    series = openSeries(arguments, [cache], cache.memory, start)
+    sink = openEvents(arguments, cache)
+    position = None
+    try:
+        if arguments.checkpoint:
+            position = runCheckpointed(cache, arguments.trace, arguments.checkpoint, arguments.checkpoint_every,
+                                       start, arguments.trace_stop, arguments.prefetch, sink, series)
+        elif arguments.classify_misses:
+            classifier = MissClassifier(cache)
+            position = runTrace(classifier, arguments.trace, arguments.prefetch, sink, start, arguments.trace_stop,
+                                series)
+        else:
+            position = runTrace(cache, arguments.trace, arguments.prefetch, sink, start, arguments.trace_stop,
+                                series)
+    except (ValueError, IndexError) as error:
+        raise SystemExit('Error, {}'.format(error))
+    finally:
+        if sink is not None:
+            sink.close()
+        if series is not None:
+            series.close(position)
+    
+    if arguments.events != 'none':
+        printSummary(cache)
+        if arguments.classify_misses:
+            printMissBreakdown(classifier)
 
 def main():
     ##
     # Driver function for the cache simulator
     
+    arguments = parseArguments()
+    
+    # Batch mode replays a trace file instead of reading commands
+    if arguments.trace is not None:
+        runBatch(arguments)
+        return
+    
     # Print welcome message
     print('*** Welcome to the cache simulator ***')
     
-    # Initalize the RAM
-    RAM = initializeRAM(getCommandLineArgs())
+    # Initalize the RAM, which a memory-mapped image sizes by itself
+    if arguments.memory_map:
+        RAM = MappedMemory(arguments.memory)
+    else:
+        RAM = initializeRAM(arguments.memory)
     
     # Initalize the Cache
-    cache = initalizeCache()
+    cache = initalizeCache(RAM)
+    cache.writeBackOnFlush = arguments.flush_write_back
     
     # Print the menu and receive the first command
     printMenu()
@@ -32,7 +430,7 @@ def main():
         if 'cache-read' in command:
             # Extract the address from the user input
             address = command[command.find('x')+1:]
-            cacheRead(cache, RAM, address)
+            cacheRead(cache, address)
             
         elif 'cache-write' in command:
             # Extract the hexidecimals from the user input
@@ -46,7 +444,7 @@ def main():
             byte = hexs[hexs.find('x')+1:]
             
             # Pass in the address and byte in hex without the '0x'
-            cacheWrite(cache, RAM, address, byte)
+            cacheWrite(cache, address, byte)
         
         elif command == 'cache-flush':
             cache = cacheFlush(cache)
@@ -0,0 +1,218 @@
+# File: checkpoint.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the checkpoints, which save a cache, its RAM and the trace
+#   position to a compact binary file so a run can be resumed or forked later
+
+from itertools import islice
+import io
+import os
+import pickle
+import random
+import struct
+import zlib
+
+from cache import Cache
+from functions import replayAccesses
+from memory import Memory, SparseMemory
+from tracefile import readTrace
+
+# A checkpoint is an 8 byte header (magic, version, 3 reserved bytes) followed by the
+#  zlib compressed state. Arrays and the RAM are stored as their raw bytes
+CHECKPOINT_MAGIC = b'CCKP'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_HEADER = struct.Struct('<4sB3x')
+
+# The only classes a checkpoint may hold besides the built in types
+CHECKPOINT_CLASSES = {('array', 'array'), ('array', '_array_reconstructor')}
+
+class CheckpointUnpickler(pickle.Unpickler):
+    ##
+    # Reads the state back without running anything but array constructors
+
+    def find_class(self, module, name):
+        ##
+        # @param Module
+        # @param Name
+        # @returns The class, if it is one a checkpoint may hold
+
+        if (module, name) not in CHECKPOINT_CLASSES:
+            raise ValueError('checkpoints cannot hold {}.{}'.format(module, name))
+
+        return pickle.Unpickler.find_class(self, module, name)
+
+def memoryState(memory):
+    ##
+    # @param Memory - a Memory, MappedMemory or SparseMemory
+    # @returns Dict of what it takes to rebuild the RAM
+
+    if isinstance(memory, SparseMemory):
+        return {'kind' : 'sparse', 'size' : memory.size, 'pageSize' : memory.pageSize, 'fill' : memory.fill,
+                'pages' : {number : bytes(page) for number, page in memory.pages.items()},
+                'traffic' : (memory.bytesRead, memory.bytesWritten)}
+
+    return {'kind' : 'flat', 'size' : memory.size, 'RAM' : bytes(memory.RAM),
+            'traffic' : (memory.bytesRead, memory.bytesWritten)}
+
+def restoreMemory(state):
+    ##
+    # @param State - from memoryState
+    # @returns The rebuilt RAM. A memory-mapped RAM comes back as a flat Memory
+
+    if state['kind'] == 'sparse':
+        memory = SparseMemory(size=state['size'], pageSize=state['pageSize'], fill=state['fill'])
+        memory.pages = {number : bytearray(page) for number, page in state['pages'].items()}
+    else:
+        memory = Memory(size=state['size'])
+        memory.RAM[:] = state['RAM']
+
+    # Checkpoints saved before the RAM counted its traffic start from 0
+    memory.bytesRead, memory.bytesWritten = state.get('traffic', (0, 0))
+
+    return memory
+
+def packCheckpoint(cache, position=0):
+    ##
+    # Saves everything a replay depends on: the configuration, lines, data, statistics,
+    #  flush behaviour and replacement policy state of the cache, its RAM and RAM traffic
+    #  counts, the random module's state (unseeded random replacement draws from it) and
+    #  how far the trace got
+    # @param Cache - a Cache on top of a Memory, MappedMemory or SparseMemory
+    # @param Position - number of trace accesses already replayed
+    # @returns The checkpoint as bytes
+
+    if type(cache) is not Cache:
+        raise ValueError('only a single cache can be checkpointed')
+
+    # Sets a flush left alone are emptied first, so the saved lines are the live ones
+    cache.renewSets()
+
+    # The policy shares the valid bits with the cache, which are saved with the lines
+    policy = {name : value for name, value in vars(cache.policy).items() if name != 'valid'}
+
+    state = {
+        'configuration' : (cache.cacheSize, cache.blockSize, cache.associativity, cache.replacementPolicy,
+                           cache.writeHitPolicy, cache.writeMissPolicy, cache.addressWidth),
+        'stats' : tuple(cache.stats()),
+        'valid' : bytes(cache.valid),
+        'dirty' : bytes(cache.dirty),
+        'tags' : cache.tags,
+        'addressUsed' : cache.addressUsed,
+        'data' : bytes(cache.data),
+        'policy' : policy,
+        'writeBackOnFlush' : cache.writeBackOnFlush,
+        'memory' : memoryState(cache.memory),
+        'random' : random.getstate(),
+        'position' : position,
+    }
+
+    return (CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION)
+            + zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL)))
+
+def unpackCheckpoint(checkpoint, name='checkpoint'):
+    ##
+    # Rebuilds a cache and its RAM exactly as they were saved. The random module's state
+    #  is restored too, so the run carries on as if it had never stopped
+    # @param Checkpoint - bytes from packCheckpoint
+    # @param Name - of the checkpoint, for error messages
+    # @returns The Cache and the number of trace accesses already replayed
+
+    if len(checkpoint) < CHECKPOINT_HEADER.size:
+        raise ValueError('{} is not a version {} checkpoint'.format(name, CHECKPOINT_VERSION))
+
+    magic, version = CHECKPOINT_HEADER.unpack_from(checkpoint)
+
+    if magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION:
+        raise ValueError('{} is not a version {} checkpoint'.format(name, CHECKPOINT_VERSION))
+
+    try:
+        state = CheckpointUnpickler(io.BytesIO(zlib.decompress(checkpoint[CHECKPOINT_HEADER.size:]))).load()
+    except (zlib.error, pickle.UnpicklingError, EOFError) as error:
+        raise ValueError('{} is damaged ({})'.format(name, error))
+
+    *configuration, addressWidth = state['configuration']
+
+    cache = Cache(restoreMemory(state['memory']), *configuration, addressWidth=addressWidth)
+    cache.hits, cache.misses, cache.evictions, cache.writeBacks = state['stats']
+    cache.valid[:] = state['valid']
+    cache.dirty[:] = state['dirty']
+    cache.tags[:] = state['tags']
+    cache.addressUsed[:] = state['addressUsed']
+    cache.data[:] = state['data']
+    cache.writeBackOnFlush = state.get('writeBackOnFlush', False)
+
+    for line, valid in enumerate(cache.valid):
+        if valid:
+            cache.index[cache.addressUsed[line] >> cache.numberOfOffsetBits] = line
+
+    vars(cache.policy).update(state['policy'])
+    random.setstate(state['random'])
+
+    return cache, state['position']
+
+def saveCheckpoint(filename, cache, position=0):
+    ##
+    # Writes a checkpoint. It goes to a temporary file first, so a run stopped halfway
+    #  through saving still has its previous checkpoint
+    # @param filename - of the checkpoint
+    # @param Cache, Position - as for packCheckpoint
+    # @returns None
+
+    temporary = filename + '.tmp'
+
+    ofs = open(temporary, 'wb')
+    ofs.write(packCheckpoint(cache, position))
+    ofs.close()
+
+    os.replace(temporary, filename)
+
+def loadCheckpoint(filename):
+    ##
+    # Reads a checkpoint. Loading the same checkpoint several times forks independent
+    #  runs from the same warm state
+    # @param filename - of the checkpoint
+    # @returns The Cache and the number of trace accesses already replayed
+
+    ifs = open(filename, 'rb')
+    checkpoint = ifs.read()
+    ifs.close()
+
+    return unpackCheckpoint(checkpoint, filename)
+
+def runCheckpointed(cache, filename, checkpointFile, every=0, start=0, stop=None, background=False, sink=None,
+                    series=None):
+    ##
+    # Replays a trace, saving a checkpoint every so many accesses and at the end
+    # @param Cache
+    # @param filename - of the trace file, in the syntax readTrace takes
+    # @param CheckpointFile - file the checkpoints are saved to, each replacing the last
+    # @param Every - accesses between checkpoints, 0 to only save one at the end
+    # @param Start - number of the first access to replay, the ones before are skipped
+    # @param Stop - number of the access to stop before, None to replay to the end
+    # @param Background - read and decompress the trace on a background thread
+    # @param Sink - EventSink to record the accesses in, None to record nothing
+    # @param Series - TimeSeries to sample at the end of every window, None for no series
+    # @returns The number of the access after the last one replayed
+
+    accesses = iter(readTrace(filename, background=background, start=start))
+    position = start
+
+    try:
+        while True:
+            length = max(0, stop - position) if stop is not None else None
+            if every:
+                length = every if length is None else min(every, length)
+
+            reached = replayAccesses(cache, islice(accesses, length), sink, position, series)
+            ended = length is None or reached < position + length
+            position = reached
+
+            saveCheckpoint(checkpointFile, cache, position)
+
+            if ended or (stop is not None and position >= stop):
+                return position
+    finally:
+        accesses.close()
@@ -0,0 +1,336 @@
+# File: coherence.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the multi-core model, where every core has a private cache
+#   and a snooping bus keeps the caches coherent with MESI or MOESI
+
+from cache import Cache, AccessResult
+
+COHERENCE_PROTOCOLS = ['MESI', 'MOESI']
+
+# Line states, stored one byte per line
+INVALID = 0
+SHARED = 1
+EXCLUSIVE = 2
+MODIFIED = 3
+OWNED = 4
+
+# Bus transactions, in the order they are printed
+BUS_MESSAGES = ['BusRd', 'BusRdX', 'BusUpgr', 'Flush', 'WriteBack']
+
+class CoherentCache(Cache):
+    ##
+    # The private cache of one core. Every line has a coherence state as well as its
+    #  valid and dirty bits, which stay in step with it (valid unless invalid, dirty when
+    #  modified or owned). The protocols need write_back and write_allocate
+
+    def __init__(self, memory, bus, core, cacheSize, blockSize, associativity,
+                 replacementPolicy='least_recently_used', addressWidth=8, replacementOptions=None):
+        ##
+        # Configures a cold cache
+        # @param Memory - the shared RAM
+        # @param Bus - the Multiprocessor the cache snoops on
+        # @param Core - number of the core the cache belongs to
+        # @param CacheSize, BlockSize, Associativity, ReplacementPolicy, AddressWidth,
+        #  ReplacementOptions - as for Cache
+
+        Cache.__init__(self, memory, cacheSize, blockSize, associativity, replacementPolicy,
+                       'write_back', 'write_allocate', addressWidth, replacementOptions)
+
+        self.bus = bus
+        self.core = core
+        self.state = bytearray(self.numberOfSets * self.associativity)
+
+        # Lines taken away by other cores' writes, and the misses on blocks taken that way
+        self.invalidations = 0
+        self.coherenceMisses = 0
+        self.invalidatedBlocks = set()
+
+    def renewSet(self, setIndex):
+        ##
+        # Empties a set left from before a flush, states included
+        # @param SetIndex
+        # @returns None
+
+        Cache.renewSet(self, setIndex)
+
+        first = setIndex * self.associativity
+        self.state[first:first + self.associativity] = bytes(self.associativity)
+
+    def countMiss(self, block):
+        ##
+        # A miss on a block another core's write took away is a coherence miss
+        # @param Block - block number
+        # @returns None
+
+        if block in self.invalidatedBlocks:
+            self.invalidatedBlocks.discard(block)
+            self.coherenceMisses += 1
+
+    def read(self, address):
+        ##
+        # A read miss asks the bus for the block (BusRd), and keeps it exclusive when
+        #  no other cache has it
+        # @param Address - as an integer
+        # @returns AccessResult of the cache-read
+
+        tag, setIndex, blockOffset = self.expandAddress(address)
+        block = address >> self.numberOfOffsetBits
+
+        line = self.index.get(block, -1)
+
+        if line >= 0:
+            self.hits += 1
+            self.policy.touch(line)
+
+            return AccessResult(setIndex, tag, True, -1, -1, self.data[line * self.blockSize + blockOffset], -1)
+
+        self.misses += 1
+        self.countMiss(block)
+
+        data, shared = self.bus.busRead(self, block)
+        line = self.replace(tag, setIndex, address, data)
+        self.state[line] = SHARED if shared else EXCLUSIVE
+
+        return AccessResult(setIndex, tag, False, line - setIndex * self.associativity, address,
+                            self.data[line * self.blockSize + blockOffset], -1)
+
+    def fetch(self, address):
+        ##
+        # @param Address - as an integer
+        # @returns AccessResult of the cache-read
+
+        return self.read(address)
+
+    def write(self, address, byte):
+        ##
+        # Writing needs the only copy: a shared or owned hit invalidates the other copies
+        #  (BusUpgr) and a miss reads the block for ownership (BusRdX)
+        # @param Address - as an integer
+        # @param Byte - as an integer
+        # @returns AccessResult of the cache-write
+
+        tag, setIndex, blockOffset = self.expandAddress(address)
+        block = address >> self.numberOfOffsetBits
+
+        line = self.index.get(block, -1)
+        hit = line >= 0
+
+        if hit:
+            self.hits += 1
+            evictionLine = -1
+
+            if self.state[line] == SHARED or self.state[line] == OWNED:
+                self.bus.busUpgrade(self, block)
+        else:
+            self.misses += 1
+            self.countMiss(block)
+
+            data = self.bus.busReadExclusive(self, block)
+            line = self.replace(tag, setIndex, address, data)
+            evictionLine = line - setIndex * self.associativity
+
+        self.state[line] = MODIFIED
+        self.dirty[line] = 1
+        self.data[line * self.blockSize + blockOffset] = byte
+
+        return AccessResult(setIndex, tag, hit, evictionLine, address, byte, 1)
+
+    def evictLine(self, line):
+        ##
+        # Modified and owned blocks go back to the RAM on eviction
+        # @param Line - line number
+        # @returns None
+
+        if self.dirty[line]:
+            self.bus.messages['WriteBack'] += 1
+
+        Cache.evictLine(self, line)
+        self.state[line] = INVALID
+
+    def writeBackDirty(self):
+        ##
+        # Each dirty line a flush writes back is a WriteBack on the bus
+        # @returns None
+
+        writeBacks = self.writeBacks
+        Cache.writeBackDirty(self)
+        self.bus.messages['WriteBack'] += self.writeBacks - writeBacks
+
+    def snoop(self, block, invalidate, supply=True):
+        ##
+        # Reacts to another core's bus transaction for block
+        # @param Block - block number
+        # @param Invalidate - the other core is about to write (BusRdX or BusUpgr)
+        # @param Supply - the other core needs the data (BusRd or BusRdX)
+        # @returns The block's bytes when this cache had the only up to date copy (or
+        #  None), and whether this cache held the block
+
+        line = self.index.get(block, -1)
+
+        if line < 0:
+            return None, False
+
+        state = self.state[line]
+        start = line * self.blockSize
+        data = None
+
+        # A dirty copy is newer than the RAM, so it is flushed onto the bus
+        if supply and (state == MODIFIED or state == OWNED):
+            data = bytes(self.dataView[start:start + self.blockSize])
+            self.bus.messages['Flush'] += 1
+
+        if invalidate:
+            del self.index[block]
+            self.valid[line] = 0
+            self.dirty[line] = 0
+            self.state[line] = INVALID
+            self.policy.invalidate(line)
+            self.invalidations += 1
+            self.invalidatedBlocks.add(block)
+        elif state == MODIFIED:
+            # MOESI keeps the dirty copy as its owner, MESI writes it back and shares it
+            if self.bus.protocol == 'MOESI':
+                self.state[line] = OWNED
+            else:
+                self.memory.writeBlock(self.addressUsed[line], data)
+                self.writeBacks += 1
+                self.bus.messages['WriteBack'] += 1
+                self.state[line] = SHARED
+                self.dirty[line] = 0
+        elif state == EXCLUSIVE:
+            self.state[line] = SHARED
+
+        return data, True
+
+class Multiprocessor:
+    ##
+    # Several cores with identical private caches on a snooping bus in front of one
+    #  shared Memory. Every miss or upgrade is broadcast to the other caches, which
+    #  supply, share or invalidate their copies as the protocol says
+
+    def __init__(self, memory, numberOfCores, cacheSize, blockSize, associativity,
+                 replacementPolicy='least_recently_used', protocol='MESI', addressWidth=8,
+                 replacementOptions=None):
+        ##
+        # @param Memory - the shared RAM
+        # @param NumberOfCores
+        # @param CacheSize, BlockSize, Associativity, ReplacementPolicy, AddressWidth,
+        #  ReplacementOptions - of every private cache, as for Cache
+        # @param Protocol - 'MESI' or 'MOESI'
+
+        if protocol not in COHERENCE_PROTOCOLS:
+            raise ValueError('coherence protocol must be one of {}'.format(', '.join(COHERENCE_PROTOCOLS)))
+        if numberOfCores < 1:
+            raise ValueError('there must be at least one core')
+
+        self.memory = memory
+        self.protocol = protocol
+        self.messages = dict.fromkeys(BUS_MESSAGES, 0)
+        self.caches = [CoherentCache(memory, self, core, cacheSize, blockSize, associativity,
+                                     replacementPolicy, addressWidth, replacementOptions)
+                       for core in range(numberOfCores)]
+
+    def busRead(self, requester, block):
+        ##
+        # @param Requester - the CoherentCache that missed
+        # @param Block - block number
+        # @returns The block's bytes if another cache supplied them (None to read the RAM),
+        #  and whether another cache holds the block
+
+        self.messages['BusRd'] += 1
+
+        data = None
+        shared = False
+
+        for cache in self.caches:
+            if cache is not requester:
+                supplied, held = cache.snoop(block, False)
+                shared = shared or held
+                if supplied is not None:
+                    data = supplied
+
+        return data, shared
+
+    def busReadExclusive(self, requester, block):
+        ##
+        # @param Requester - the CoherentCache that missed on a write
+        # @param Block - block number
+        # @returns The block's bytes if another cache supplied them, None to read the RAM
+
+        self.messages['BusRdX'] += 1
+
+        data = None
+
+        for cache in self.caches:
+            if cache is not requester:
+                supplied, held = cache.snoop(block, True)
+                if supplied is not None:
+                    data = supplied
+
+        return data
+
+    def busUpgrade(self, requester, block):
+        ##
+        # Invalidates every other copy of a block the requester already holds
+        # @param Requester - the CoherentCache writing to a shared or owned line
+        # @param Block - block number
+        # @returns None
+
+        self.messages['BusUpgr'] += 1
+
+        for cache in self.caches:
+            if cache is not requester:
+                cache.snoop(block, True, False)
+
+    def cache(self, core):
+        ##
+        # @param Core - core number
+        # @returns The core's CoherentCache
+
+        if core < 0 or core >= len(self.caches):
+            raise ValueError('core {} does not exist, there are {} cores'.format(core, len(self.caches)))
+
+        return self.caches[core]
+
+    def read(self, core, address):
+        ##
+        # @param Core - core number
+        # @param Address - as an integer
+        # @returns AccessResult of the core's cache-read
+
+        return self.cache(core).read(address)
+
+    def write(self, core, address, byte):
+        ##
+        # @param Core - core number
+        # @param Address - as an integer
+        # @param Byte - as an integer
+        # @returns AccessResult of the core's cache-write
+
+        return self.cache(core).write(address, byte)
+
+    def fetch(self, core, address):
+        ##
+        # @param Core - core number
+        # @param Address - as an integer
+        # @returns AccessResult of the core's cache-read
+
+        return self.cache(core).read(address)
+
+    def flush(self, core):
+        ##
+        # Makes one core's cache cold again, keeping its statistics
+        # @param Core - core number
+        # @returns None
+
+        self.cache(core).flush()
+
+    def stats(self):
+        ##
+        # @returns List of CacheStats, one per core
+
+        return [cache.stats() for cache in self.caches]
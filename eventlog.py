@@ -0,0 +1,213 @@
+# File: eventlog.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the event sinks that record what every access did, in the
+#   menu's text format, as JSON lines or as packed binary records
+
+import struct
+import sys
+
+from tracefile import WRITE, FLUSH
+
+# How much a batch run records: nothing at all, only the final summary, every
+#  sample-th access and the summary, or every access and the summary
+EVENT_LEVELS = ['none', 'summary', 'sampled', 'full']
+
+EVENT_FORMATS = ['text', 'jsonl', 'binary']
+
+# A binary event log is an 8 byte header (magic, version, 3 reserved bytes) followed by
+#  fixed width little-endian records: access number, operation letter, core, address,
+#  set, tag, hit, eviction line, RAM address, data byte and dirty bit, with -1 for the
+#  fields an access does not have
+EVENT_MAGIC = b'CEVT'
+EVENT_VERSION = 1
+EVENT_RECORD = struct.Struct('<QBHqiqBiqhb')
+
+# Size of the write buffer of an event log file
+EVENT_BUFFER_SIZE = 1 << 20
+
+class EventSink:
+    ##
+    # Where the accesses of a run are recorded. A sink with a period above 1 only records
+    #  every period-th access (counting from the first), so long runs can be sampled
+
+    def __init__(self, ofs, period=1):
+        ##
+        # @param ofs - file to write the events to
+        # @param Period - record every period-th access
+
+        if period < 1:
+            raise ValueError('the event sample period must be at least 1')
+
+        self.ofs = ofs
+        self.period = period
+
+    def record(self, number, operation, core, address, result):
+        ##
+        # Records one access
+        # @param Number - of the access in the run, from 0
+        # @param Operation - READ, WRITE, FETCH or FLUSH
+        # @param Core - core number
+        # @param Address - as an integer, -1 for a cache-flush
+        # @param Result - AccessResult of the access, None for a cache-flush
+        # @returns None
+
+        raise NotImplementedError
+
+    def close(self):
+        ##
+        # Writes out whatever is still buffered and closes the file
+        # @returns None
+
+        self.ofs.close()
+
+class TextEventSink(EventSink):
+    ##
+    # The lines the menu prints after each command, written in one call per access
+
+    def __init__(self, ofs, tagDigits, addressDigits, period=1):
+        ##
+        # @param ofs - text file to write the events to
+        # @param TagDigits - hexadecimal digits of a tag, as Cache.tagDigits
+        # @param AddressDigits - hexadecimal digits of an address, as Cache.addressDigits
+        # @param Period - record every period-th access
+
+        EventSink.__init__(self, ofs, period)
+
+        self.tagDigits = tagDigits
+        self.addressDigits = addressDigits
+
+    def record(self, number, operation, core, address, result):
+        ##
+        # @param Number, Operation, Core, Address, Result - as for EventSink.record
+        # @returns None
+
+        if operation == FLUSH:
+            self.ofs.write('cache_cleared\n')
+            return
+
+        lines = 'set:{}\ntag:{:0{}X}\n'.format(result.set, result.tag, self.tagDigits)
+
+        if operation == WRITE:
+            lines += 'write_hit:{}\neviction_line:{}\nram_address:0x{:0{}X}\ndata:0x{:02X}\ndirty_bit:{}\n'.format(
+                'yes' if result.hit else 'no', result.evictionLine, result.ramAddress, self.addressDigits,
+                result.data, result.dirtyBit)
+        elif result.hit:
+            lines += 'hit:yes\neviction_line:-1\nram_address:-1\ndata:0x{:02X}\n'.format(result.data)
+        else:
+            lines += 'hit:no\neviction_line:{}\nram_address:0x{:0{}X}\ndata:0x{:02X}\n'.format(
+                result.evictionLine, result.ramAddress, self.addressDigits, result.data)
+
+        self.ofs.write(lines)
+
+class JsonEventSink(EventSink):
+    ##
+    # One JSON object per access per line. The objects are formatted directly, as the
+    #  fields are all numbers or single letters
+
+    def record(self, number, operation, core, address, result):
+        ##
+        # @param Number, Operation, Core, Address, Result - as for EventSink.record
+        # @returns None
+
+        if result is None:
+            self.ofs.write('{{"access":{},"operation":"{}","core":{}}}\n'.format(number, operation, core))
+            return
+
+        self.ofs.write('{{"access":{},"operation":"{}","core":{},"address":{},"set":{},"tag":{},'
+                       '"hit":{},"eviction_line":{},"ram_address":{},"data":{},"dirty_bit":{}}}\n'.format(
+                           number, operation, core, address, result.set, result.tag,
+                           'true' if result.hit else 'false', result.evictionLine, result.ramAddress,
+                           result.data, result.dirtyBit))
+
+class BinaryEventSink(EventSink):
+    ##
+    # One EVENT_RECORD per access after an EVENT_MAGIC header
+
+    def __init__(self, ofs, period=1):
+        ##
+        # @param ofs - binary file to write the events to
+        # @param Period - record every period-th access
+
+        EventSink.__init__(self, ofs, period)
+
+        self.pack = EVENT_RECORD.pack
+        ofs.write(EVENT_MAGIC + bytes([EVENT_VERSION, 0, 0, 0]))
+
+    def record(self, number, operation, core, address, result):
+        ##
+        # @param Number, Operation, Core, Address, Result - as for EventSink.record
+        # @returns None
+
+        if result is None:
+            self.ofs.write(self.pack(number, ord(operation), core, -1, -1, -1, 0, -1, -1, -1, -1))
+            return
+
+        self.ofs.write(self.pack(number, ord(operation), core, address, result.set, result.tag, result.hit,
+                                 result.evictionLine, result.ramAddress, result.data, result.dirtyBit))
+
+def openEventSink(filename, fileFormat=None, period=1, tagDigits=2, addressDigits=2):
+    ##
+    # Opens an event log file behind a large write buffer
+    # @param filename - of the event log, '-' for the console
+    # @param FileFormat - 'text', 'jsonl' or 'binary', binary for .bin, jsonl for .jsonl
+    #  and text otherwise by default
+    # @param Period - record every period-th access
+    # @param TagDigits, AddressDigits - of the cache, for the text format
+    # @returns EventSink
+
+    if fileFormat is None:
+        if filename.endswith('.bin'):
+            fileFormat = 'binary'
+        elif filename.endswith('.jsonl'):
+            fileFormat = 'jsonl'
+        else:
+            fileFormat = 'text'
+
+    if fileFormat not in EVENT_FORMATS:
+        raise ValueError('event format must be one of {}'.format(', '.join(EVENT_FORMATS)))
+
+    # The console gets its own buffer, which closing the sink leaves open
+    if filename == '-':
+        sys.stdout.flush()
+        filename = sys.stdout.fileno()
+
+    mode = 'wb' if fileFormat == 'binary' else 'w'
+    ofs = open(filename, mode, buffering=EVENT_BUFFER_SIZE, closefd=not isinstance(filename, int))
+
+    if fileFormat == 'binary':
+        return BinaryEventSink(ofs, period)
+    if fileFormat == 'jsonl':
+        return JsonEventSink(ofs, period)
+
+    return TextEventSink(ofs, tagDigits, addressDigits, period)
+
+def readEventLog(filename):
+    ##
+    # Streams a binary event log
+    # @param filename - of the event log
+    # @returns Generator of (number, operation, core, address, set, tag, hit, evictionLine,
+    #  ramAddress, data, dirtyBit) per recorded access
+
+    ifs = open(filename, 'rb')
+
+    try:
+        header = ifs.read(len(EVENT_MAGIC) + 4)
+
+        if header[:len(EVENT_MAGIC)] != EVENT_MAGIC or len(header) < 5 or header[4] != EVENT_VERSION:
+            raise ValueError('{} is not a version {} event log'.format(filename, EVENT_VERSION))
+
+        while True:
+            chunk = ifs.read(EVENT_RECORD.size * 4096)
+            if not chunk:
+                break
+            if len(chunk) % EVENT_RECORD.size:
+                raise ValueError('{} ends in the middle of a record'.format(filename))
+
+            for fields in EVENT_RECORD.iter_unpack(chunk):
+                yield (fields[0], chr(fields[1])) + fields[2:6] + (bool(fields[6]),) + fields[7:]
+    finally:
+        ifs.close()
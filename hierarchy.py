@@ -0,0 +1,315 @@
+# File: hierarchy.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the multi-level cache hierarchy, where each level's
+#   misses and write backs go to the level below it instead of the RAM
+
+from cache import Cache, AccessResult
+
+INCLUSION_POLICIES = ['non_inclusive', 'inclusive', 'exclusive']
+
+class LevelCache(Cache):
+    ##
+    # One cache of a Hierarchy. Its memory is the level below it (or the RAM), and its
+    #  inclusion policy says how its blocks relate to those of the caches right above it:
+    #   'non_inclusive' - fills and write backs just pass through, nothing is kept in step
+    #   'inclusive' - evicting a block also evicts it from every level above
+    #    (back-invalidation), copying their dirty data into the victim first
+    #   'exclusive' - a victim cache: a hit moves the block up, misses are not allocated
+    #    here, and the levels above put every block they evict into it
+
+    def __init__(self, memory, cacheSize, blockSize, associativity,
+                 replacementPolicy='least_recently_used', writeHitPolicy='write_back',
+                 writeMissPolicy='write_allocate', addressWidth=8, replacementOptions=None,
+                 name='L1', inclusion='non_inclusive'):
+        ##
+        # Configures a cold level
+        # @param Memory - the level below, or the RAM
+        # @param CacheSize, BlockSize, Associativity, ReplacementPolicy, WriteHitPolicy,
+        #  WriteMissPolicy, AddressWidth, ReplacementOptions - as for Cache
+        # @param Name - printed with the level's statistics, e.g. 'L2'
+        # @param Inclusion - 'non_inclusive', 'inclusive' or 'exclusive'
+
+        if inclusion not in INCLUSION_POLICIES:
+            raise ValueError('inclusion policy must be one of {}'.format(', '.join(INCLUSION_POLICIES)))
+
+        Cache.__init__(self, memory, cacheSize, blockSize, associativity, replacementPolicy,
+                       writeHitPolicy, writeMissPolicy, addressWidth, replacementOptions)
+
+        self.name = name
+        self.inclusion = inclusion
+        self.backInvalidations = 0
+
+        # Levels whose memory is this level
+        self.upperLevels = []
+
+        # Blocks of an exclusive level below move up into this one instead of being copied
+        self.exclusiveBelow = isinstance(memory, LevelCache) and memory.inclusion == 'exclusive'
+
+        # An instruction cache only reads, so it copies blocks out of an exclusive level
+        #  (leaving them for the data side to find) and drops its victims
+        self.readOnly = False
+
+    def invalidateLine(self, line):
+        ##
+        # Empties a line without writing it anywhere
+        # @param Line - line number
+        # @returns None
+
+        del self.index[self.addressUsed[line] >> self.numberOfOffsetBits]
+        self.valid[line] = 0
+        self.dirty[line] = 0
+        self.policy.invalidate(line)
+
+    def backInvalidate(self, address, size, target, targetLine):
+        ##
+        # Removes every block of this level and the levels above it inside a block the
+        #  level below is evicting. Dirty data is copied into the evicted line, this level's
+        #  before that of the levels above, so the newest copy lands last
+        # @param Address - of the evicted block
+        # @param Size - of the evicted block in bytes
+        # @param Target - the level evicting the block
+        # @param TargetLine - line number of the block in target
+        # @returns None
+
+        blockSize = self.blockSize
+
+        for blockAddress in range(address, address + size, blockSize):
+            line = self.index.get(blockAddress >> self.numberOfOffsetBits, -1)
+
+            if line < 0:
+                continue
+
+            if self.dirty[line]:
+                start = line * blockSize
+                targetStart = targetLine * target.blockSize + blockAddress - address
+                target.data[targetStart:targetStart + blockSize] = self.dataView[start:start + blockSize]
+                target.dirty[targetLine] = 1
+
+            self.invalidateLine(line)
+            self.backInvalidations += 1
+
+        for upper in self.upperLevels:
+            upper.backInvalidate(address, size, target, targetLine)
+
+    def evictLine(self, line):
+        ##
+        # Takes the block out of a valid line. An inclusive level first removes it from the
+        #  levels above, and a level above an exclusive one moves it down even when clean
+        # @param Line - line number
+        # @returns None
+
+        if self.inclusion == 'inclusive':
+            for upper in self.upperLevels:
+                upper.backInvalidate(self.addressUsed[line], self.blockSize, self, line)
+
+        if not self.exclusiveBelow:
+            Cache.evictLine(self, line)
+            return
+
+        start = line * self.blockSize
+        dirty = self.dirty[line]
+
+        self.evictions += 1
+        del self.index[self.addressUsed[line] >> self.numberOfOffsetBits]
+
+        if self.readOnly:
+            return
+
+        if dirty:
+            self.writeBacks += 1
+
+        self.memory.insertVictim(self.addressUsed[line], bytes(self.dataView[start:start + self.blockSize]), dirty)
+
+    def fillLine(self, line, tag, address, data=None):
+        ##
+        # Fills a line, taking the block (and its dirty bit) out of an exclusive level below
+        # @param Line - line number
+        # @param Tag
+        # @param Address - any address inside the new block
+        # @param Data - the whole new block, read from below by default
+        # @returns None
+
+        dirty = 0
+
+        if data is None and self.exclusiveBelow:
+            data, dirty = self.memory.takeBlock(address - address % self.blockSize, self.blockSize, self.readOnly)
+
+        Cache.fillLine(self, line, tag, address, data)
+        self.dirty[line] = dirty
+
+    def takeBlock(self, address, size, copy=False):
+        ##
+        # A miss in the level above an exclusive level. A hit hands the block up and
+        #  empties the line; a miss passes the block up from below without keeping it
+        # @param Address - of the block
+        # @param Size - of the block in bytes
+        # @param Copy - leave the block where it is and hand up a clean copy
+        # @returns The block's bytes and dirty bit
+
+        line = self.index.get(address >> self.numberOfOffsetBits, -1)
+
+        if line >= 0:
+            self.hits += 1
+            start = line * self.blockSize
+            data = bytes(self.dataView[start:start + size])
+
+            if copy:
+                self.policy.touch(line)
+                return data, 0
+
+            dirty = self.dirty[line]
+            self.invalidateLine(line)
+            return data, dirty
+
+        self.misses += 1
+
+        if self.exclusiveBelow:
+            return self.memory.takeBlock(address, size, copy)
+
+        return bytes(self.memory.readBlock(address, size)), 0
+
+    def insertVictim(self, address, data, dirty):
+        ##
+        # Puts a block evicted by the level above into an exclusive level
+        # @param Address - of the block
+        # @param Data - the whole block
+        # @param Dirty - the block's dirty bit
+        # @returns None
+
+        tag, setIndex, blockOffset = self.expandAddress(address)
+
+        line = self.index.get(address >> self.numberOfOffsetBits, -1)
+
+        if line < 0:
+            line = self.replace(tag, setIndex, address, data)
+        else:
+            start = line * self.blockSize
+            self.data[start:start + self.blockSize] = data
+
+        self.dirty[line] |= dirty
+
+    def write(self, address, byte):
+        ##
+        # Byte writes from above (write-through or no_write_allocate) never allocate in an
+        #  exclusive level, so blocks only arrive as victims
+        # @param Address - as an integer
+        # @param Byte - as an integer
+        # @returns AccessResult of the cache-write
+
+        if self.inclusion != 'exclusive' or address >> self.numberOfOffsetBits in self.index:
+            return Cache.write(self, address, byte)
+
+        tag, setIndex, blockOffset = self.expandAddress(address)
+
+        self.misses += 1
+        self.memory.write(address, byte)
+
+        return AccessResult(setIndex, tag, False, -1, address, byte, -1)
+
+class Hierarchy:
+    ##
+    # A chain of caches in front of a Memory, first level first. The first level may be
+    #  split into a data cache and an instruction cache that share the level below.
+    #  Reads and writes go to the (data) first level and fetches to the instruction cache
+
+    def __init__(self, memory, levels, instructionCache=None, inclusion='non_inclusive', addressWidth=8):
+        ##
+        # Configures a cold hierarchy
+        # @param Memory - the RAM under the last level
+        # @param Levels - list of dicts of LevelCache arguments, first level first, e.g.
+        #  {'cacheSize' : 32, 'blockSize' : 8, 'associativity' : 2, 'inclusion' : 'inclusive'}
+        # @param InstructionCache - dict of LevelCache arguments for a split first level
+        #  instruction cache, None for a unified first level
+        # @param Inclusion - inclusion policy of the levels that do not give one
+        # @param AddressWidth - number of bits in an address
+
+        if not levels:
+            raise ValueError('a hierarchy needs at least one level')
+
+        self.memory = memory
+        self.levels = []
+
+        # Build from the RAM up so every level's memory exists first
+        below = memory
+        for number in range(len(levels), 0, -1):
+            name = 'L1D' if number == 1 and instructionCache is not None else 'L{}'.format(number)
+            below = self.addLevel(below, levels[number - 1], name, inclusion, addressWidth)
+
+        self.dataCache = below
+
+        # First level first
+        self.levels.reverse()
+
+        if instructionCache is None:
+            self.instructionCache = below
+        else:
+            self.instructionCache = self.addLevel(self.levels[1] if len(self.levels) > 1 else memory,
+                                                  instructionCache, 'L1I', inclusion, addressWidth)
+            self.instructionCache.readOnly = True
+            self.levels.insert(1, self.levels.pop())
+
+    def addLevel(self, below, options, name, inclusion, addressWidth):
+        ##
+        # Builds a level on top of below
+        # @param Below - the level below, or the RAM
+        # @param Options - dict of LevelCache arguments
+        # @param Name - of the level
+        # @param Inclusion - default inclusion policy
+        # @param AddressWidth - number of bits in an address
+        # @returns The LevelCache
+
+        options = dict(options)
+        options.setdefault('inclusion', inclusion)
+
+        level = LevelCache(below, addressWidth=addressWidth, name=name, **options)
+
+        if isinstance(below, LevelCache):
+            if below.inclusion == 'exclusive' and below.blockSize != level.blockSize:
+                raise ValueError('{} is exclusive, so its block size must match {}'.format(below.name, name))
+            if below.blockSize < level.blockSize:
+                raise ValueError('{} blocks cannot be smaller than {} blocks'.format(below.name, name))
+            below.upperLevels.append(level)
+
+        self.levels.append(level)
+
+        return level
+
+    def read(self, address):
+        ##
+        # @param Address - as an integer
+        # @returns AccessResult of the first level data cache-read
+
+        return self.dataCache.read(address)
+
+    def write(self, address, byte):
+        ##
+        # @param Address - as an integer
+        # @param Byte - as an integer
+        # @returns AccessResult of the first level data cache-write
+
+        return self.dataCache.write(address, byte)
+
+    def fetch(self, address):
+        ##
+        # @param Address - as an integer
+        # @returns AccessResult of the first level instruction cache-read
+
+        return self.instructionCache.read(address)
+
+    def flush(self):
+        ##
+        # Makes every level cold again, keeping the statistics
+        # @returns None
+
+        for level in self.levels:
+            level.flush()
+
+    def stats(self):
+        ##
+        # @returns List of (level name, CacheStats), first level first
+
+        return [(level.name, level.stats()) for level in self.levels]
@@ -0,0 +1,401 @@
+# File: memory.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the RAM the cache sits in front of and the loaders for
+#   the memory image formats it understands
+
+import mmap
+import os
+
+MEMORY_FORMATS = ['text', 'binary', 'ihex']
+
+def guessFormat(filename):
+    ##
+    # Picks the memory image format from the file extension
+    # @param filename
+    # @returns 'binary' for .bin, 'ihex' for .hex/.ihex, otherwise 'text'
+
+    extension = filename[filename.rfind('.'):].lower()
+
+    if extension == '.bin':
+        return 'binary'
+    if extension == '.hex' or extension == '.ihex':
+        return 'ihex'
+
+    return 'text'
+
+def parseHexBytes(text):
+    ##
+    # @param Text - bytes in hex separated by whitespace
+    # @returns The bytes
+
+    # fromhex skips the whitespace between bytes, so a well formed text converts in one pass.
+    #  Single digit bytes need converting one token at a time
+    try:
+        return bytes.fromhex(text)
+    except ValueError:
+        return bytes(int(token, 16) for token in text.split())
+
+def readTextImage(filename):
+    ##
+    # Reads a text image with one byte in hex per line, like input.txt.
+    #  A line '@<address in hex>' moves the following bytes to that address
+    # @param filename
+    # @returns List of (address, bytes) for every run of bytes
+
+    ifs = open(filename)
+    text = ifs.read()
+    ifs.close()
+
+    segments = text.split('@')
+
+    # Bytes before the first '@' line start at address 0
+    records = [(0, parseHexBytes(segments[0]))]
+
+    for segment in segments[1:]:
+        address, _, data = segment.partition('\n')
+        records.append((int(address, 16), parseHexBytes(data)))
+
+    return records
+
+def readIntelHex(filename):
+    ##
+    # Reads an Intel HEX image
+    # @param filename
+    # @returns List of (address, bytes) for every data record
+
+    records = []
+
+    # Added to every record address by extended segment (02) and linear (04) records
+    base = 0
+
+    ifs = open(filename)
+
+    for lineNumber, line in enumerate(ifs, 1):
+        line = line.strip()
+
+        if not line:
+            continue
+        if line[0] != ':':
+            ifs.close()
+            raise ValueError('{}:{}: Intel HEX records start with ":"'.format(filename, lineNumber))
+
+        record = bytes.fromhex(line[1:])
+
+        if len(record) < 5 or len(record) != record[0] + 5 or sum(record) & 0xFF:
+            ifs.close()
+            raise ValueError('{}:{}: bad Intel HEX record'.format(filename, lineNumber))
+
+        recordType = record[3]
+        data = record[4:-1]
+
+        if recordType == 0:
+            records.append((base + (record[1] << 8 | record[2]), data))
+        elif recordType == 1:
+            break
+        elif recordType == 2:
+            base = int.from_bytes(data, 'big') << 4
+        elif recordType == 4:
+            base = int.from_bytes(data, 'big') << 16
+
+    ifs.close()
+
+    return records
+
+class Memory:
+    ##
+    # The RAM the cache sits in front of, held as one flat bytearray indexed by address
+
+    def __init__(self, filename=None, numOfBytes=None, size=256, fileFormat=None):
+        ##
+        # Creates an all zero RAM, then loads the memory image if one is given
+        # @param filename - memory image
+        # @param NumOfBytes - how many bytes of the image to transfer into the RAM, all by default
+        # @param Size - of the RAM in bytes
+        # @param FileFormat - 'text', 'binary' or 'ihex', guessed from the extension by default
+
+        self.size = size
+        self.RAM = bytearray(size)
+        self.view = memoryview(self.RAM)
+
+        # Traffic between the RAM and the caches, loading the image aside
+        self.bytesRead = 0
+        self.bytesWritten = 0
+
+        if filename is not None:
+            self.load(filename, numOfBytes, fileFormat)
+
+    def load(self, filename, numOfBytes=None, fileFormat=None):
+        ##
+        # Copies a memory image into the RAM
+        # @param filename - memory image
+        # @param NumOfBytes - how many bytes of the image to transfer, all by default
+        # @param FileFormat - 'text', 'binary' or 'ihex', guessed from the extension by default
+        # @returns None
+
+        if fileFormat is None:
+            fileFormat = guessFormat(filename)
+
+        if fileFormat == 'text':
+            records = readTextImage(filename)
+        elif fileFormat == 'binary':
+            ifs = open(filename, 'rb')
+            records = [(0, ifs.read(numOfBytes if numOfBytes is not None else -1))]
+            ifs.close()
+        elif fileFormat == 'ihex':
+            records = readIntelHex(filename)
+        else:
+            raise ValueError('memory format must be one of {}'.format(', '.join(MEMORY_FORMATS)))
+
+        # Loading the image is not traffic
+        bytesWritten = self.bytesWritten
+
+        for address, data in records:
+            # Only the first numOfBytes addresses are transferred
+            if numOfBytes is not None:
+                data = data[:max(0, numOfBytes - address)]
+
+            if address + len(data) > self.size:
+                raise ValueError('{} does not fit in a {} byte RAM'.format(filename, self.size))
+
+            self.writeBlock(address, data)
+
+        self.bytesWritten = bytesWritten
+
+    def read(self, address):
+        ##
+        # Reads one byte straight from the RAM, bypassing any cache
+        # @param Address - as an integer
+        # @returns The byte as an integer
+
+        self.bytesRead += 1
+
+        return self.RAM[address]
+
+    def write(self, address, byte):
+        ##
+        # Writes one byte straight to the RAM, bypassing any cache
+        # @param Address - as an integer
+        # @param Byte - as an integer
+        # @returns None
+
+        self.bytesWritten += 1
+        self.RAM[address] = byte
+
+    def readBlock(self, address, size):
+        ##
+        # @param Address - of the first byte of the block
+        # @param Size - of the block in bytes
+        # @returns The block as a memoryview into the RAM
+
+        if address + size > self.size:
+            raise IndexError('address 0x{:X} is outside the {} byte RAM'.format(address + size - 1, self.size))
+
+        self.bytesRead += size
+
+        return self.view[address:address + size]
+
+    def writeBlock(self, address, data):
+        ##
+        # @param Address - of the first byte of the block
+        # @param Data - bytes of the block
+        # @returns None
+
+        if address + len(data) > self.size:
+            raise IndexError('address 0x{:X} is outside the {} byte RAM'.format(address + len(data) - 1, self.size))
+
+        self.bytesWritten += len(data)
+        self.view[address:address + len(data)] = data
+
+    def regions(self):
+        ##
+        # @returns List of (address, bytes) for every part of the RAM that holds data
+
+        return [(0, self.view)]
+
+class MappedMemory(Memory):
+    ##
+    # A RAM backed by a memory-mapped binary image file. Block fills and write backs
+    #  read and write the mapping directly, and changes persist to the file
+
+    def __init__(self, filename, size=None, copyOnWrite=False):
+        ##
+        # Maps the image file, growing it with zeros to size bytes if it is smaller
+        # @param filename - raw binary memory image
+        # @param Size - of the RAM in bytes, the size of the file by default
+        # @param CopyOnWrite - keep changes in memory instead of writing them to the file
+
+        self.filename = filename
+        self.file = open(filename, 'r+b')
+
+        fileSize = os.fstat(self.file.fileno()).st_size
+        if size is None:
+            size = fileSize
+        elif size > fileSize:
+            if copyOnWrite:
+                self.file.close()
+                raise ValueError('{} is smaller than {} bytes'.format(filename, size))
+            self.file.truncate(size)
+
+        if size == 0:
+            self.file.close()
+            raise ValueError('cannot map the empty file {}'.format(filename))
+
+        self.size = size
+        self.RAM = mmap.mmap(self.file.fileno(), size,
+                             access=mmap.ACCESS_COPY if copyOnWrite else mmap.ACCESS_WRITE)
+        self.view = memoryview(self.RAM)
+
+        self.bytesRead = 0
+        self.bytesWritten = 0
+
+    def load(self, filename, numOfBytes=None, fileFormat=None):
+        ##
+        # The image is the mapping itself, so nothing can be loaded into it
+        # @returns Raises ValueError
+
+        raise ValueError('a mapped RAM is initialized from its own file')
+
+    def flush(self):
+        ##
+        # Writes every change made through the mapping back to the file
+        # @returns None
+
+        self.RAM.flush()
+
+    def close(self):
+        ##
+        # Flushes and unmaps the file
+        # @returns None
+
+        self.view.release()
+        self.RAM.flush()
+        self.RAM.close()
+        self.file.close()
+
+class SparseMemory(Memory):
+    ##
+    # A RAM for wide address spaces. Fixed size pages are only allocated when first
+    #  written to, and reads of untouched pages return the fill value
+
+    def __init__(self, filename=None, numOfBytes=None, size=1 << 64, fileFormat=None,
+                 pageSize=4096, fill=0):
+        ##
+        # Creates an empty RAM, then loads the memory image if one is given
+        # @param filename - memory image
+        # @param NumOfBytes - how many bytes of the image to transfer into the RAM, all by default
+        # @param Size - of the address space in bytes
+        # @param FileFormat - 'text', 'binary' or 'ihex', guessed from the extension by default
+        # @param PageSize - in bytes, a power of two
+        # @param Fill - value of every byte that was never written
+
+        if pageSize < 1 or pageSize & (pageSize - 1):
+            raise ValueError('page size must be a power of two')
+
+        self.size = size
+        self.pageSize = pageSize
+        self.pageShift = pageSize.bit_length() - 1
+        self.pageMask = pageSize - 1
+        self.fill = fill
+        self.emptyPage = bytes([fill]) * pageSize
+
+        # Page number -> bytearray of the page
+        self.pages = {}
+
+        self.bytesRead = 0
+        self.bytesWritten = 0
+
+        if filename is not None:
+            self.load(filename, numOfBytes, fileFormat)
+
+    def page(self, address):
+        ##
+        # @param Address - any address in the page
+        # @returns The page holding address, allocating it on first touch
+
+        pageNumber = address >> self.pageShift
+        page = self.pages.get(pageNumber)
+
+        if page is None:
+            page = self.pages[pageNumber] = bytearray(self.emptyPage)
+
+        return page
+
+    def residentPages(self):
+        ##
+        # @returns The number of pages allocated so far
+
+        return len(self.pages)
+
+    def read(self, address):
+        ##
+        # Reads one byte straight from the RAM, bypassing any cache
+        # @param Address - as an integer
+        # @returns The byte as an integer
+
+        self.bytesRead += 1
+        page = self.pages.get(address >> self.pageShift)
+
+        if page is None:
+            return self.fill
+
+        return page[address & self.pageMask]
+
+    def write(self, address, byte):
+        ##
+        # Writes one byte straight to the RAM, bypassing any cache
+        # @param Address - as an integer
+        # @param Byte - as an integer
+        # @returns None
+
+        self.bytesWritten += 1
+        self.page(address)[address & self.pageMask] = byte
+
+    def readBlock(self, address, size):
+        ##
+        # @param Address - of the first byte of the block
+        # @param Size - of the block in bytes
+        # @returns The block as bytes
+
+        if address + size > self.size:
+            raise IndexError('address 0x{:X} is outside the {} byte RAM'.format(address + size - 1, self.size))
+
+        offset = address & self.pageMask
+
+        # Aligned cache blocks no bigger than a page never cross into the next one
+        if offset + size <= self.pageSize:
+            self.bytesRead += size
+            page = self.pages.get(address >> self.pageShift)
+            if page is None:
+                return self.emptyPage[:size]
+            return page[offset:offset + size]
+
+        return bytes(self.read(address + i) for i in range(size))
+
+    def writeBlock(self, address, data):
+        ##
+        # @param Address - of the first byte of the block
+        # @param Data - bytes of the block
+        # @returns None
+
+        if address + len(data) > self.size:
+            raise IndexError('address 0x{:X} is outside the {} byte RAM'.format(address + len(data) - 1, self.size))
+
+        self.bytesWritten += len(data)
+
+        # Copy one page worth at a time
+        written = 0
+        while written < len(data):
+            offset = (address + written) & self.pageMask
+            length = min(self.pageSize - offset, len(data) - written)
+            self.page(address + written)[offset:offset + length] = data[written:written + length]
+            written += length
+
+    def regions(self):
+        ##
+        # @returns List of (address, bytes) for every allocated page, in address order
+
+        return [(pageNumber << self.pageShift, self.pages[pageNumber]) for pageNumber in sorted(self.pages)]
@@ -0,0 +1,163 @@
+# File: missclassifier.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the 3C miss classifier, which sorts a cache's misses into
+#   compulsory, capacity and conflict misses, overall and per set
+
+from array import array
+from collections import namedtuple, OrderedDict
+
+# Misses of a cache or of one of its sets, by kind
+MissBreakdown = namedtuple('MissBreakdown', ['compulsory', 'capacity', 'conflict'])
+
+class MissClassifier:
+    ##
+    # Stands in front of a Cache and classifies each of its misses:
+    #   compulsory - the first access to the block
+    #   capacity - a fully associative least recently used cache of the same size would
+    #    have missed too
+    #   conflict - that fully associative cache would have hit
+    # The first accesses are a hash set of block numbers and the fully associative cache
+    #  is a shadow ordered dict, which moves a block to its end in constant time. The
+    #  shadow follows the same rules as Cache (only reads refresh a block, and writes only
+    #  allocate with write_allocate), so a fully associative least recently used cache
+    #  has no conflict misses. A flush makes every block cold again, so its next miss is
+    #  compulsory. Reads, writes, fetches and flushes go to the cache as they would
+    #  without the classifier, so it can be replayed like one
+
+    def __init__(self, cache):
+        ##
+        # @param Cache - the cache to classify the misses of
+
+        self.cache = cache
+        self.shadowSize = cache.numberOfSets * cache.associativity
+        self.numberOfOffsetBits = cache.numberOfOffsetBits
+        self.setMask = cache.setMask
+        self.allocateWrites = cache.writeMissPolicy == 'write_allocate'
+
+        # Misses of each kind, by set index
+        self.compulsory = array('Q', bytes(8 * cache.numberOfSets))
+        self.capacity = array('Q', bytes(8 * cache.numberOfSets))
+        self.conflict = array('Q', bytes(8 * cache.numberOfSets))
+
+        self.reset()
+
+    def reset(self):
+        ##
+        # Makes every block cold, keeping the counts so far
+        # @returns None
+
+        self.seen = set()
+        # Block number -> None, least recently used first
+        self.shadow = OrderedDict()
+
+    def shadowAccess(self, block, refresh, allocate):
+        ##
+        # Looks a block up in the shadow fully associative cache
+        # @param Block - block number
+        # @param Refresh - make the block the most recently used on a hit
+        # @param Allocate - bring the block in on a miss
+        # @returns Whether the shadow cache hit
+
+        shadow = self.shadow
+
+        if block in shadow:
+            if refresh:
+                shadow.move_to_end(block)
+            return True
+
+        if allocate:
+            shadow[block] = None
+            if len(shadow) > self.shadowSize:
+                shadow.popitem(last=False)
+
+        return False
+
+    def classify(self, block, shadowHit):
+        ##
+        # Counts one miss of the cache
+        # @param Block - block number
+        # @param ShadowHit - whether the shadow cache hit
+        # @returns None
+
+        setIndex = block & self.setMask
+
+        if block not in self.seen:
+            self.seen.add(block)
+            self.compulsory[setIndex] += 1
+        elif shadowHit:
+            self.conflict[setIndex] += 1
+        else:
+            self.capacity[setIndex] += 1
+
+    def read(self, address):
+        ##
+        # @param Address - as an integer
+        # @returns AccessResult of the cache-read
+
+        misses = self.cache.misses
+        result = self.cache.read(address)
+
+        block = address >> self.numberOfOffsetBits
+        shadowHit = self.shadowAccess(block, True, True)
+
+        if self.cache.misses != misses:
+            self.classify(block, shadowHit)
+
+        return result
+
+    def fetch(self, address):
+        ##
+        # @param Address - as an integer
+        # @returns AccessResult of the cache-read
+
+        misses = self.cache.misses
+        result = self.cache.fetch(address)
+
+        block = address >> self.numberOfOffsetBits
+        shadowHit = self.shadowAccess(block, True, True)
+
+        if self.cache.misses != misses:
+            self.classify(block, shadowHit)
+
+        return result
+
+    def write(self, address, byte):
+        ##
+        # @param Address - as an integer
+        # @param Byte - as an integer
+        # @returns AccessResult of the cache-write
+
+        misses = self.cache.misses
+        result = self.cache.write(address, byte)
+
+        block = address >> self.numberOfOffsetBits
+        shadowHit = self.shadowAccess(block, False, self.allocateWrites)
+
+        if self.cache.misses != misses:
+            self.classify(block, shadowHit)
+
+        return result
+
+    def flush(self):
+        ##
+        # Flushes the cache and makes every block cold
+        # @returns None
+
+        self.cache.flush()
+        self.reset()
+
+    def totals(self):
+        ##
+        # @returns MissBreakdown of the whole cache
+
+        return MissBreakdown(sum(self.compulsory), sum(self.capacity), sum(self.conflict))
+
+    def perSet(self):
+        ##
+        # @returns List of MissBreakdown, one per set in set order
+
+        return [MissBreakdown(*counts) for counts in zip(self.compulsory, self.capacity, self.conflict)]
@@ -0,0 +1,381 @@
+# File: profiler.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the trace profiler, which measures reuse distances, working
+#   sets and the hottest blocks and sets of a trace in one pass, in bounded memory
+
+from array import array
+from collections import namedtuple, OrderedDict
+from math import log
+
+from stackdistance import ReuseDistanceTree
+from tracefile import readTrace, FLUSH
+
+MASK64 = (1 << 64) - 1
+
+# One bucket of the reuse distance histogram: distances low..high, and how many
+#  accesses had them (estimated once the blocks are sampled)
+ReuseBucket = namedtuple('ReuseBucket', ['low', 'high', 'accesses'])
+
+# The working set of one stretch of windowSize accesses: the mean and peak, over its
+#  accesses, of the distinct blocks among the windowSize accesses up to each one
+WorkingSet = namedtuple('WorkingSet', ['mean', 'peak'])
+
+# The profile of a trace
+TraceProfile = namedtuple('TraceProfile', ['accesses', 'distinctBlocks', 'coldAccesses', 'reuseDistances',
+                                           'workingSets', 'hotBlocks', 'hotSets', 'exact'])
+
+def mixBlock(block):
+    ##
+    # Scrambles a block number with splitmix64, so its bits can be used as a hash
+    # @param Block - block number
+    # @returns 64 bit hash
+
+    block = (block + 0x9E3779B97F4A7C15) & MASK64
+    block = ((block ^ (block >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    block = ((block ^ (block >> 27)) * 0x94D049BB133111EB) & MASK64
+
+    return block ^ (block >> 31)
+
+class HyperLogLog:
+    ##
+    # Estimates the number of distinct hashes added in a fixed 2**precision bytes: each
+    #  register keeps the longest run of leading zeros seen among the hashes it gets
+
+    def __init__(self, precision=12):
+        ##
+        # @param Precision - log2 of the number of registers, about 1.04 / sqrt(2**precision)
+        #  relative error
+
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, hashed):
+        ##
+        # @param Hashed - 64 bit hash
+        # @returns None
+
+        rest = hashed & (MASK64 >> self.precision)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        register = hashed >> (64 - self.precision)
+
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def count(self):
+        ##
+        # @returns Estimated number of distinct hashes
+
+        size = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / size) * size * size / sum(2.0 ** -rank for rank in self.registers)
+        empty = self.registers.count(0)
+
+        # Small counts are better estimated by the empty registers
+        if estimate <= 2.5 * size and empty:
+            estimate = size * log(size / empty)
+
+        return int(round(estimate))
+
+class DistinctCounter:
+    ##
+    # Counts distinct blocks exactly in a hash set until it holds limit blocks, then
+    #  moves to a HyperLogLog
+
+    def __init__(self, limit):
+        ##
+        # @param Limit - most blocks kept exactly
+
+        self.limit = limit
+        self.blocks = set()
+        self.sketch = None
+
+    def add(self, block, hashed):
+        ##
+        # @param Block - block number
+        # @param Hashed - mixBlock of the block
+        # @returns None
+
+        if self.sketch is not None:
+            self.sketch.add(hashed)
+            return
+
+        self.blocks.add(block)
+
+        if len(self.blocks) > self.limit:
+            self.sketch = HyperLogLog()
+            for block in self.blocks:
+                self.sketch.add(mixBlock(block))
+            self.blocks = None
+
+    def count(self):
+        ##
+        # @returns Number of distinct blocks, estimated once they outgrew the limit
+
+        return len(self.blocks) if self.sketch is None else self.sketch.count()
+
+    def exact(self):
+        ##
+        # @returns Whether count is exact
+
+        return self.sketch is None
+
+class CountMinSketch:
+    ##
+    # Estimates how often each block was used in depth rows of width counters: a block
+    #  adds to one counter per row, and its estimate is the smallest of them, which never
+    #  undercounts
+
+    def __init__(self, width=1 << 16, depth=4):
+        ##
+        # @param Width - counters per row, a power of two
+        # @param Depth - number of rows
+
+        self.shift = 64 - (width.bit_length() - 1)
+        self.width = width
+        self.depth = depth
+        self.counters = array('Q', bytes(8 * width * depth))
+
+        # Odd multipliers of the rows' multiply-shift hashes
+        self.multipliers = [mixBlock(row) | 1 for row in range(depth)]
+
+    def add(self, hashed, amount=1):
+        ##
+        # @param Hashed - 64 bit hash of the block
+        # @param Amount - uses to add
+        # @returns The block's new estimate
+
+        counters = self.counters
+        estimate = None
+
+        for row, multiplier in enumerate(self.multipliers):
+            counter = row * self.width + (((hashed * multiplier) & MASK64) >> self.shift)
+            counters[counter] += amount
+            if estimate is None or counters[counter] < estimate:
+                estimate = counters[counter]
+
+        return estimate
+
+class TraceProfiler:
+    ##
+    # Profiles a trace at block granularity, splitting addresses into blocks and sets the
+    #  way Cache.expandAddress does, in one pass:
+    #   reuse distances - how many other blocks were used between two uses of a block,
+    #    as a power of two histogram
+    #   working sets - the number of distinct blocks in a window sliding over the last
+    #    windowSize accesses, as its mean and peak over each stretch of windowSize accesses
+    #   hot blocks and sets - the topN most used of each
+    # Everything is exact until the trace has more than maxBlocks distinct blocks. Past
+    #  that, reuse distances and the working set window follow hash samples of the blocks
+    #  (halving the sample rate whenever one outgrows maxBlocks, and scaling distances and
+    #  counts back up), distinct counts move to HyperLogLog sketches and block counts to a
+    #  Count-Min sketch that keeps only the topN candidates
+
+    def __init__(self, blockSize, numberOfSets=1, windowSize=10000, topN=10, maxBlocks=1 << 20):
+        ##
+        # @param BlockSize - in bytes, a power of two
+        # @param NumberOfSets - of the cache geometry, a power of two
+        # @param WindowSize - accesses in the sliding working set window
+        # @param TopN - number of hot blocks and sets to keep
+        # @param MaxBlocks - most blocks tracked exactly
+
+        if blockSize < 1 or blockSize & (blockSize - 1) or numberOfSets < 1 or numberOfSets & (numberOfSets - 1):
+            raise ValueError('block size and number of sets must be powers of two')
+        if windowSize < 1 or topN < 1 or maxBlocks < 1:
+            raise ValueError('window size, top N and block limit must be at least 1')
+
+        self.numberOfOffsetBits = blockSize.bit_length() - 1
+        self.setMask = numberOfSets - 1
+        self.windowSize = windowSize
+        self.topN = topN
+        self.maxBlocks = maxBlocks
+
+        self.accesses = 0
+
+        # Reuse distances of the sampled blocks: a block is sampled while its hash's top
+        #  24 bits are below threshold, so the sample rate is threshold / 2**24
+        self.tree = ReuseDistanceTree()
+        self.threshold = 1 << 24
+        # Estimated first uses, and accesses by distance bit length
+        self.coldAccesses = 0.0
+        self.histogram = array('d', bytes(8 * 65))
+
+        self.distinct = DistinctCounter(maxBlocks)
+        # Blocks of the last windowSize accesses -> their last use, oldest use first. A
+        #  block is in the window while its hash's top 24 bits are below windowThreshold
+        self.window = OrderedDict()
+        self.windowThreshold = 1 << 24
+        # Sum and peak of the working sets of this stretch, and its accesses so far
+        self.windowTotal = 0.0
+        self.windowPeak = 0.0
+        self.windowAccesses = 0
+        self.workingSets = []
+
+        self.setCounts = array('Q', bytes(8 * numberOfSets))
+        # Block -> uses while exact; the topN candidates once the Count-Min sketch takes over
+        self.blockCounts = {}
+        self.sketch = None
+
+    def access(self, address):
+        ##
+        # Records one access
+        # @param Address - as an integer
+        # @returns None
+
+        block = address >> self.numberOfOffsetBits
+        hashed = mixBlock(block)
+        self.accesses += 1
+
+        self.setCounts[block & self.setMask] += 1
+        self.countBlock(block, hashed)
+
+        self.distinct.add(block, hashed)
+        self.slideWindow(block, hashed)
+
+        # Only sampled blocks have reuse distances, each standing in for 1 / rate blocks
+        if hashed >> 40 < self.threshold:
+            scale = (1 << 24) / self.threshold
+            distance = self.tree.distance(block)
+
+            if distance < 0:
+                self.coldAccesses += scale
+                if len(self.tree.last) > self.maxBlocks:
+                    self.shrinkSample()
+            else:
+                self.histogram[int(distance * scale).bit_length()] += scale
+
+    def countBlock(self, block, hashed):
+        ##
+        # Counts a use of block, exactly or in the Count-Min sketch
+        # @param Block - block number
+        # @param Hashed - mixBlock of the block
+        # @returns None
+
+        counts = self.blockCounts
+
+        if self.sketch is None:
+            counts[block] = counts.get(block, 0) + 1
+
+            if len(counts) > self.maxBlocks:
+                self.sketch = CountMinSketch()
+                for block, count in counts.items():
+                    self.sketch.add(mixBlock(block), count)
+                self.blockCounts = dict(self.topBlocks(counts))
+            return
+
+        estimate = self.sketch.add(hashed)
+
+        if block in counts or len(counts) < self.topN:
+            counts[block] = estimate
+            return
+
+        # Replace the coldest candidate once the block passes it
+        coldest = min(counts, key=counts.get)
+        if estimate > counts[coldest]:
+            del counts[coldest]
+            counts[block] = estimate
+
+    def shrinkSample(self):
+        ##
+        # Halves the sample rate, forgetting the blocks that fall out of the sample
+        # @returns None
+
+        self.threshold >>= 1
+
+        for block in [block for block in self.tree.last if mixBlock(block) >> 40 >= self.threshold]:
+            self.tree.forget(block)
+
+    def slideWindow(self, block, hashed):
+        ##
+        # Moves the working set window on to the latest access: block becomes the most
+        #  recently used, and the blocks last used windowSize accesses ago drop out
+        # @param Block - block number
+        # @param Hashed - mixBlock of the block
+        # @returns None
+
+        window = self.window
+
+        if hashed >> 40 < self.windowThreshold:
+            window[block] = self.accesses
+            window.move_to_end(block)
+
+            if len(window) > self.maxBlocks:
+                self.windowThreshold >>= 1
+                for block in [block for block in window if mixBlock(block) >> 40 >= self.windowThreshold]:
+                    del window[block]
+
+        oldest = self.accesses - self.windowSize
+        while window and next(iter(window.values())) <= oldest:
+            window.popitem(last=False)
+
+        workingSet = len(window) * (1 << 24) / self.windowThreshold
+        self.windowTotal += workingSet
+        if workingSet > self.windowPeak:
+            self.windowPeak = workingSet
+
+        self.windowAccesses += 1
+        if self.windowAccesses == self.windowSize:
+            self.endWindow()
+
+    def workingSet(self):
+        ##
+        # @returns WorkingSet of the stretch so far
+
+        return WorkingSet(self.windowTotal / self.windowAccesses, int(round(self.windowPeak)))
+
+    def endWindow(self):
+        ##
+        # Closes the stretch of windowSize accesses
+        # @returns None
+
+        self.workingSets.append(self.workingSet())
+        self.windowTotal = 0.0
+        self.windowPeak = 0.0
+        self.windowAccesses = 0
+
+    def topBlocks(self, counts):
+        ##
+        # @param Counts - dict of key -> count
+        # @returns The topN (key, count) pairs with a count, most used first
+
+        return sorted((item for item in counts.items() if item[1]), key=lambda item: (-item[1], item[0]))[:self.topN]
+
+    def profile(self):
+        ##
+        # @returns TraceProfile of the accesses so far. The last stretch is included if it
+        #  has any accesses
+
+        workingSets = list(self.workingSets)
+        if self.windowAccesses:
+            workingSets.append(self.workingSet())
+
+        reuseDistances = []
+        for bits, accesses in enumerate(self.histogram):
+            if accesses:
+                low = 0 if bits == 0 else 1 << (bits - 1)
+                reuseDistances.append(ReuseBucket(low, (1 << bits) - 1, int(round(accesses))))
+
+        hotSets = self.topBlocks(dict(enumerate(self.setCounts)))
+        exact = (self.sketch is None and self.distinct.exact() and self.threshold == 1 << 24
+                 and self.windowThreshold == 1 << 24)
+
+        return TraceProfile(self.accesses, self.distinct.count(), int(round(self.coldAccesses)), reuseDistances,
+                            workingSets, self.topBlocks(self.blockCounts), hotSets, exact)
+
+def profileTrace(filename, blockSize, numberOfSets=1, windowSize=10000, topN=10, maxBlocks=1 << 20):
+    ##
+    # Profiles a whole trace file. Cache-flushes are not accesses, so they are skipped
+    # @param filename - of the trace file, in the syntax readTrace takes
+    # @param BlockSize, NumberOfSets, WindowSize, TopN, MaxBlocks - as for TraceProfiler
+    # @returns TraceProfile
+
+    profiler = TraceProfiler(blockSize, numberOfSets, windowSize, topN, maxBlocks)
+    access = profiler.access
+
+    for operation, address, byte, core in readTrace(filename):
+        if operation != FLUSH:
+            access(address)
+
+    return profiler.profile()
@@ -0,0 +1,938 @@
+# File: replacement.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the replacement policies a cache uses to pick which line
+#   of a set to evict on a miss
+
+from array import array
+from random import randint
+
+class RandomReplacement:
+    ##
+    # Replaces the first invalid line in the set, otherwise a random one.
+    # Every policy numbers lines as set index * associativity + way, and is told
+    #  about read hits (touch), lines it picked being filled (fill) and flushes (reset).
+    #  This class is also the interface a new policy implements: its constructor takes
+    #  the number of sets, the associativity, the cache's valid bits and any replacement
+    #  options as keywords, and registerPolicy makes it available to every cache.
+    # With a seed every set draws from its own xorshift generator, seeded from the seed
+    #  and the set index, so a set's choices do not depend on the other sets
+
+    def __init__(self, numberOfSets, associativity, valid, seed=None):
+        ##
+        # @param NumberOfSets
+        # @param Associativity
+        # @param Valid - the cache's valid bits, one per line
+        # @param Seed - integer seed for the per-set generators, None to use the random module
+
+        self.numberOfSets = numberOfSets
+        self.associativity = associativity
+        self.valid = valid
+        self.seed = seed
+
+        # Generator state of each set, 0 until the set first draws a number
+        if seed is not None:
+            self.randomState = array('Q', bytes(8 * numberOfSets))
+
+    def reset(self):
+        ##
+        # Forgets all history after a flush
+        # @returns None
+
+        pass
+
+    def resetSet(self, setIndex):
+        ##
+        # Forgets the history of one set, which a flush emptied
+        # @param SetIndex
+        # @returns None
+
+        pass
+
+    def touch(self, line):
+        ##
+        # Called on a read hit
+        # @param Line - line number
+        # @returns None
+
+        pass
+
+    def fill(self, line):
+        ##
+        # Called after the victim line has been filled
+        # @param Line - line number
+        # @returns None
+
+        pass
+
+    def invalidate(self, line):
+        ##
+        # Called when a line is emptied without being replaced (e.g. a back-invalidation),
+        #  so the policy picks it before any valid line
+        # @param Line - line number
+        # @returns None
+
+        pass
+
+    def victim(self, setIndex, tag):
+        ##
+        # Called on a miss that allocates, right before the line it returns is filled
+        # @param SetIndex
+        # @param Tag - of the block coming in
+        # @returns The line number to replace
+
+        first = setIndex * self.associativity
+
+        # This is the line to randomly replace, if neccessary
+        if self.seed is None:
+            line = first + randint(0, self.associativity-1)
+        else:
+            line = first + self.nextRandom(setIndex) % self.associativity
+
+        # Change the line to replace to be the first invalid line in a set if possible
+        invalid = self.valid.find(0, first, first + self.associativity)
+        if invalid >= 0:
+            line = invalid
+
+        return line
+
+    def nextRandom(self, setIndex):
+        ##
+        # Steps the set's xorshift64* generator
+        # @param SetIndex
+        # @returns A random 64 bit integer
+
+        state = self.randomState[setIndex]
+
+        # Seed the set with splitmix64 of the seed and set index
+        if state == 0:
+            state = (self.seed * 0x9E3779B97F4A7C15 + (setIndex + 1) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+            state = ((state ^ (state >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+            state = ((state ^ (state >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+            state = (state ^ (state >> 31)) or 1
+
+        state ^= state >> 12
+        state ^= (state << 25) & 0xFFFFFFFFFFFFFFFF
+        state ^= state >> 27
+        self.randomState[setIndex] = state
+
+        return (state * 0x2545F4914F6CDD1D) & 0xFFFFFFFFFFFFFFFF
+
+class LeastRecentlyUsed(RandomReplacement):
+    ##
+    # Evicts the least recently used line in the set.
+    # Each set keeps its lines in a doubly linked recency list, held in two arrays
+    #  with one sentinel node per set (node numberOfLines + set index). The line after
+    #  the sentinel is the least recently used and the one before it the most, so
+    #  both touching a line and picking the victim take constant time
+
+    def __init__(self, numberOfSets, associativity, valid):
+        ##
+        # @param NumberOfSets
+        # @param Associativity
+        # @param Valid - the cache's valid bits, one per line
+
+        RandomReplacement.__init__(self, numberOfSets, associativity, valid)
+        self.reset()
+
+    def reset(self):
+        ##
+        # Orders every set by way, so cold lines are used in order
+        # @returns None
+
+        associativity = self.associativity
+        numberOfLines = self.numberOfSets * associativity
+
+        following = array('l', range(1, numberOfLines + self.numberOfSets + 1))
+        preceding = array('l', range(-1, numberOfLines + self.numberOfSets - 1))
+
+        # Close each set's list into a ring through its sentinel
+        for setIndex in range(self.numberOfSets):
+            first = setIndex * associativity
+            last = first + associativity - 1
+            sentinel = numberOfLines + setIndex
+
+            following[last] = sentinel
+            following[sentinel] = first
+            preceding[first] = sentinel
+            preceding[sentinel] = last
+
+        self.following = following
+        self.preceding = preceding
+        self.numberOfLines = numberOfLines
+
+    def resetSet(self, setIndex):
+        ##
+        # Orders one set by way again
+        # @param SetIndex
+        # @returns None
+
+        associativity = self.associativity
+        first = setIndex * associativity
+        last = first + associativity - 1
+        sentinel = self.numberOfLines + setIndex
+
+        self.following[first:last] = array('l', range(first + 1, last + 1))
+        self.preceding[first + 1:last + 1] = array('l', range(first, last))
+
+        self.following[last] = sentinel
+        self.following[sentinel] = first
+        self.preceding[first] = sentinel
+        self.preceding[sentinel] = last
+
+    def touch(self, line):
+        ##
+        # Makes the line the most recently used of its set
+        # @param Line - line number
+        # @returns None
+
+        following = self.following
+        preceding = self.preceding
+        sentinel = self.numberOfLines + line // self.associativity
+
+        # Unlink the line
+        before = preceding[line]
+        after = following[line]
+        following[before] = after
+        preceding[after] = before
+
+        # Link it back in just before the sentinel
+        last = preceding[sentinel]
+        following[last] = line
+        preceding[line] = last
+        following[line] = sentinel
+        preceding[sentinel] = line
+
+    def fill(self, line):
+        ##
+        # A newly filled line is the most recently used
+        # @param Line - line number
+        # @returns None
+
+        self.touch(line)
+
+    def invalidate(self, line):
+        ##
+        # Moves an emptied line to the least recently used end, where the cold lines are
+        # @param Line - line number
+        # @returns None
+
+        following = self.following
+        preceding = self.preceding
+        sentinel = self.numberOfLines + line // self.associativity
+
+        # Unlink the line
+        before = preceding[line]
+        after = following[line]
+        following[before] = after
+        preceding[after] = before
+
+        # Link it back in just after the sentinel
+        first = following[sentinel]
+        following[sentinel] = line
+        preceding[line] = sentinel
+        following[line] = first
+        preceding[first] = line
+
+    def victim(self, setIndex, tag):
+        ##
+        # Cold lines are never touched, so they stay at the least recently used end
+        # @param SetIndex
+        # @param Tag - of the block coming in
+        # @returns The line number to replace
+
+        return self.following[self.numberOfLines + setIndex]
+
+LFU_TIE_BREAKS = ['way', 'oldest', 'newest']
+
+class LeastFrequentlyUsed(RandomReplacement):
+    ##
+    # Evicts the least frequently used line in the set.
+    # Each set groups its lines into buckets by frequency and remembers the lowest
+    #  frequency it holds, so a touch moves a line to the next bucket and the victim
+    #  comes straight from the lowest one. Ties are broken by tieBreak:
+    #   'way' - the lowest way, as the original simulator did (buckets are way bitmasks)
+    #   'oldest' - the line that reached the frequency first (buckets keep insertion order)
+    #   'newest' - the line that reached the frequency last
+    # When aging is set, every that many touches and fills of a set halve its frequencies,
+    #  so lines that were hot a long time ago can be evicted again
+
+    def __init__(self, numberOfSets, associativity, valid, tieBreak='way', aging=0):
+        ##
+        # @param NumberOfSets
+        # @param Associativity
+        # @param Valid - the cache's valid bits, one per line
+        # @param TieBreak - 'way', 'oldest' or 'newest'
+        # @param Aging - touches and fills of a set between halvings, 0 to never age
+
+        if tieBreak not in LFU_TIE_BREAKS:
+            raise ValueError('tie break must be one of {}'.format(', '.join(LFU_TIE_BREAKS)))
+
+        RandomReplacement.__init__(self, numberOfSets, associativity, valid)
+        self.tieBreak = tieBreak
+        self.aging = aging
+        self.reset()
+
+    def reset(self):
+        ##
+        # Puts every line back in the frequency 0 bucket of its set
+        # @returns None
+
+        associativity = self.associativity
+
+        self.frequency = array('Q', bytes(8 * self.numberOfSets * associativity))
+        self.minFrequency = array('Q', bytes(8 * self.numberOfSets))
+        self.uses = array('Q', bytes(8 * self.numberOfSets))
+
+        if self.tieBreak == 'way':
+            allWays = (1 << associativity) - 1
+            self.buckets = [{0 : allWays} for setIndex in range(self.numberOfSets)]
+        else:
+            self.buckets = [{0 : dict.fromkeys(range(setIndex * associativity, (setIndex + 1) * associativity))}
+                            for setIndex in range(self.numberOfSets)]
+
+    def move(self, line, newFrequency):
+        ##
+        # Moves a line from its bucket to the newFrequency bucket of its set
+        # @param Line - line number
+        # @param NewFrequency
+        # @returns None
+
+        setIndex = line // self.associativity
+        buckets = self.buckets[setIndex]
+        oldFrequency = self.frequency[line]
+
+        if self.tieBreak == 'way':
+            way = 1 << (line - setIndex * self.associativity)
+            bucket = buckets[oldFrequency] & ~way
+            if bucket:
+                buckets[oldFrequency] = bucket
+            else:
+                del buckets[oldFrequency]
+            buckets[newFrequency] = buckets.get(newFrequency, 0) | way
+        else:
+            bucket = buckets[oldFrequency]
+            del bucket[line]
+            if not bucket:
+                del buckets[oldFrequency]
+            if newFrequency in buckets:
+                buckets[newFrequency][line] = None
+            else:
+                buckets[newFrequency] = {line : None}
+
+        self.frequency[line] = newFrequency
+
+        # The line either left the lowest bucket or went below it
+        minFrequency = self.minFrequency[setIndex]
+        if newFrequency < minFrequency or minFrequency not in buckets:
+            self.minFrequency[setIndex] = min(newFrequency, minFrequency + 1)
+
+        if self.aging:
+            self.uses[setIndex] += 1
+            if self.uses[setIndex] >= self.aging:
+                self.age(setIndex)
+
+    def age(self, setIndex):
+        ##
+        # Halves the frequency of every used line in the set, keeping them at 1 or
+        #  more so cold lines are still picked first
+        # @param SetIndex
+        # @returns None
+
+        self.uses[setIndex] = 0
+
+        first = setIndex * self.associativity
+        frequency = self.frequency
+        buckets = {}
+
+        # Rebuild the buckets in the order the lines are already in, so ties keep their order
+        if self.tieBreak == 'way':
+            for line in range(first, first + self.associativity):
+                if frequency[line]:
+                    frequency[line] = max(1, frequency[line] >> 1)
+                buckets[frequency[line]] = buckets.get(frequency[line], 0) | 1 << (line - first)
+        else:
+            for oldFrequency in sorted(self.buckets[setIndex]):
+                for line in self.buckets[setIndex][oldFrequency]:
+                    if frequency[line]:
+                        frequency[line] = max(1, frequency[line] >> 1)
+                    buckets.setdefault(frequency[line], {})[line] = None
+
+        self.buckets[setIndex] = buckets
+        self.minFrequency[setIndex] = min(buckets)
+
+    def resetSet(self, setIndex):
+        ##
+        # Puts one set's lines back in its frequency 0 bucket
+        # @param SetIndex
+        # @returns None
+
+        associativity = self.associativity
+        first = setIndex * associativity
+
+        self.frequency[first:first + associativity] = array('Q', bytes(8 * associativity))
+        self.minFrequency[setIndex] = 0
+        self.uses[setIndex] = 0
+
+        if self.tieBreak == 'way':
+            self.buckets[setIndex] = {0 : (1 << associativity) - 1}
+        else:
+            self.buckets[setIndex] = {0 : dict.fromkeys(range(first, first + associativity))}
+
+    def touch(self, line):
+        ##
+        # @param Line - line number
+        # @returns None
+
+        self.move(line, self.frequency[line] + 1)
+
+    def fill(self, line):
+        ##
+        # A newly filled line starts over at a frequency of 1
+        # @param Line - line number
+        # @returns None
+
+        self.move(line, 1)
+
+    def invalidate(self, line):
+        ##
+        # An emptied line goes back to frequency 0 with the cold lines
+        # @param Line - line number
+        # @returns None
+
+        self.move(line, 0)
+
+    def victim(self, setIndex, tag):
+        ##
+        # Cold lines have a frequency of 0, so they are used first
+        # @param SetIndex
+        # @param Tag - of the block coming in
+        # @returns The line number to replace
+
+        bucket = self.buckets[setIndex][self.minFrequency[setIndex]]
+
+        if self.tieBreak == 'way':
+            return setIndex * self.associativity + (bucket & -bucket).bit_length() - 1
+        if self.tieBreak == 'oldest':
+            return next(iter(bucket))
+
+        return next(reversed(bucket))
+
+class TreePseudoLRU(RandomReplacement):
+    ##
+    # Evicts the line a binary tree of direction bits points to, the way hardware
+    #  approximates least recently used with associativity - 1 bits per set.
+    # Node n of a set's tree is bit n of one integer (the root is node 1 and node n's
+    #  children are 2n and 2n + 1), so each set's tree is a single word. A bit of 0 points
+    #  to the left half and 1 to the right; using a line points every node on its path
+    #  away from it, which is one and with a mask and one or per access. Trees are at most
+    #  64 ways wide, as in hardware, so every set's tree and mask is one 64 bit word
+
+    def __init__(self, numberOfSets, associativity, valid):
+        ##
+        # @param NumberOfSets
+        # @param Associativity - a power of two, at most 64
+        # @param Valid - the cache's valid bits, one per line
+
+        if associativity & (associativity - 1) or associativity > 64:
+            raise ValueError('tree pseudo-LRU needs a power of two associativity of at most 64')
+
+        RandomReplacement.__init__(self, numberOfSets, associativity, valid)
+
+        # Bits to keep and bits to set when each way is used
+        self.keep = array('Q')
+        self.point = array('Q')
+
+        for way in range(associativity):
+            keep = (1 << associativity) - 1
+            point = 0
+            node = 1
+            size = associativity
+
+            while node < associativity:
+                size >>= 1
+                right = way & size != 0
+                keep &= ~(1 << node)
+                if not right:
+                    point |= 1 << node
+                node = 2 * node + right
+
+            self.keep.append(keep)
+            self.point.append(point)
+
+        self.reset()
+
+    def reset(self):
+        ##
+        # Points every tree at way 0
+        # @returns None
+
+        self.trees = array('Q', bytes(8 * self.numberOfSets))
+
+    def resetSet(self, setIndex):
+        ##
+        # @param SetIndex
+        # @returns None
+
+        self.trees[setIndex] = 0
+
+    def touch(self, line):
+        ##
+        # Points the nodes above the line away from it
+        # @param Line - line number
+        # @returns None
+
+        setIndex = line // self.associativity
+        way = line - setIndex * self.associativity
+
+        self.trees[setIndex] = self.trees[setIndex] & self.keep[way] | self.point[way]
+
+    def fill(self, line):
+        ##
+        # @param Line - line number
+        # @returns None
+
+        self.touch(line)
+
+    def victim(self, setIndex, tag):
+        ##
+        # Follows the bits down from the root, after the first invalid line
+        # @param SetIndex
+        # @param Tag - of the block coming in
+        # @returns The line number to replace
+
+        first = setIndex * self.associativity
+
+        invalid = self.valid.find(0, first, first + self.associativity)
+        if invalid >= 0:
+            return invalid
+
+        tree = self.trees[setIndex]
+        node = 1
+
+        while node < self.associativity:
+            node = 2 * node + (tree >> node & 1)
+
+        return first + node - self.associativity
+
+# Re-reference prediction values are 2 bits: 0 is near-immediate, 3 is distant
+RRPV_DISTANT = 3
+RRPV_LONG = 2
+
+class StaticRRIP(RandomReplacement):
+    ##
+    # Static re-reference interval prediction: every line has a 2 bit re-reference
+    #  prediction value (RRPV). A hit sets it to 0, a fill to 2 (a long interval), and
+    #  the victim is the first line at 3, after aging the whole set until one is.
+    # A set's RRPVs are packed 2 bits per way into one integer, so finding a line at 3
+    #  and aging every line are a few whole word operations instead of a loop over ways
+
+    def __init__(self, numberOfSets, associativity, valid):
+        ##
+        # @param NumberOfSets
+        # @param Associativity
+        # @param Valid - the cache's valid bits, one per line
+
+        RandomReplacement.__init__(self, numberOfSets, associativity, valid)
+
+        # The low bit of every way's RRPV, and every RRPV at distant
+        self.lowBits = int('01' * associativity, 2)
+        self.allDistant = RRPV_DISTANT * self.lowBits
+
+        self.reset()
+
+    def reset(self):
+        ##
+        # Predicts a distant re-reference for every line
+        # @returns None
+
+        # A word per set while the RRPVs fit in 64 bits, Python integers past that
+        if self.associativity <= 32:
+            self.rrpv = array('Q', [self.allDistant]) * self.numberOfSets
+        else:
+            self.rrpv = [self.allDistant] * self.numberOfSets
+
+    def resetSet(self, setIndex):
+        ##
+        # @param SetIndex
+        # @returns None
+
+        self.rrpv[setIndex] = self.allDistant
+
+    def setRRPV(self, line, value):
+        ##
+        # @param Line - line number
+        # @param Value - RRPV from 0 to 3
+        # @returns None
+
+        setIndex = line // self.associativity
+        shift = 2 * (line - setIndex * self.associativity)
+
+        self.rrpv[setIndex] = self.rrpv[setIndex] & ~(RRPV_DISTANT << shift) | value << shift
+
+    def insertion(self, setIndex):
+        ##
+        # @param SetIndex - of the line being filled
+        # @returns The RRPV of a newly filled line
+
+        return RRPV_LONG
+
+    def touch(self, line):
+        ##
+        # A hit predicts a near-immediate re-reference
+        # @param Line - line number
+        # @returns None
+
+        self.setRRPV(line, 0)
+
+    def fill(self, line):
+        ##
+        # @param Line - line number
+        # @returns None
+
+        self.setRRPV(line, self.insertion(line // self.associativity))
+
+    def invalidate(self, line):
+        ##
+        # @param Line - line number
+        # @returns None
+
+        self.setRRPV(line, RRPV_DISTANT)
+
+    def victim(self, setIndex, tag):
+        ##
+        # The first invalid line, otherwise the first line at distant once the set has
+        #  aged by as much as its oldest line needs to get there
+        # @param SetIndex
+        # @param Tag - of the block coming in
+        # @returns The line number to replace
+
+        first = setIndex * self.associativity
+
+        invalid = self.valid.find(0, first, first + self.associativity)
+        if invalid >= 0:
+            return invalid
+
+        rrpv = self.rrpv[setIndex]
+        lowBits = self.lowBits
+        distant = rrpv & rrpv >> 1 & lowBits
+
+        if not distant:
+            # No line is at 3, so adding the same amount to every RRPV cannot carry
+            if rrpv >> 1 & lowBits:
+                rrpv += lowBits
+            elif rrpv & lowBits:
+                rrpv += 2 * lowBits
+            else:
+                rrpv += RRPV_DISTANT * lowBits
+            self.rrpv[setIndex] = rrpv
+            distant = rrpv & rrpv >> 1 & lowBits
+
+        return first + ((distant & -distant).bit_length() - 1 >> 1)
+
+class BimodalRRIP(StaticRRIP):
+    ##
+    # Bimodal re-reference interval prediction: like static, but fills predict a distant
+    #  re-reference except for one fill in every throttle, so a working set bigger than
+    #  the cache keeps part of itself instead of thrashing. The long fills are picked by
+    #  a fill counter in each set rather than at random, so runs repeat exactly and a
+    #  set's choices do not depend on the other sets
+
+    def __init__(self, numberOfSets, associativity, valid, throttle=32):
+        ##
+        # @param NumberOfSets
+        # @param Associativity
+        # @param Valid - the cache's valid bits, one per line
+        # @param Throttle - fills per long fill
+
+        if throttle < 1:
+            raise ValueError('the bimodal throttle must be at least 1')
+
+        self.throttle = throttle
+
+        # Fills of each set since its last long fill
+        self.fills = array('L', [0]) * numberOfSets
+
+        StaticRRIP.__init__(self, numberOfSets, associativity, valid)
+
+    def insertion(self, setIndex):
+        ##
+        # @param SetIndex - of the line being filled
+        # @returns The RRPV of a newly filled line
+
+        fills = self.fills[setIndex] + 1
+
+        if fills >= self.throttle:
+            self.fills[setIndex] = 0
+            return RRPV_LONG
+
+        self.fills[setIndex] = fills
+
+        return RRPV_DISTANT
+
+# Set dueling roles of the dynamic policy's sets
+FOLLOWER_SET = 0
+STATIC_LEADER = 1
+BIMODAL_LEADER = 2
+
+class DynamicRRIP(BimodalRRIP):
+    ##
+    # Dynamic re-reference interval prediction: a few leader sets always fill like the
+    #  static policy and as many like the bimodal one, and a saturating counter (PSEL)
+    #  goes up on the static leaders' misses and down on the bimodal leaders'. The other
+    #  sets follow whichever policy the counter says misses less
+
+    def __init__(self, numberOfSets, associativity, valid, throttle=32, leaderSets=32, selectorBits=10):
+        ##
+        # @param NumberOfSets
+        # @param Associativity
+        # @param Valid - the cache's valid bits, one per line
+        # @param Throttle - fills per long fill of the bimodal policy
+        # @param LeaderSets - leader sets of each policy, at most half the sets each
+        # @param SelectorBits - width of the PSEL counter
+
+        if leaderSets < 1 or selectorBits < 1:
+            raise ValueError('the dynamic policy needs at least 1 leader set and selector bit')
+
+        BimodalRRIP.__init__(self, numberOfSets, associativity, valid, throttle)
+
+        self.selectorMax = (1 << selectorBits) - 1
+        self.selectorMiddle = 1 << (selectorBits - 1)
+        self.selector = self.selectorMiddle
+
+        # One static and one bimodal leader at the start and end of each equal region.
+        #  A single set has no room to duel, so it just follows the counter
+        self.role = bytearray(numberOfSets)
+        leaders = min(leaderSets, numberOfSets // 2)
+        if leaders:
+            region = numberOfSets // leaders
+            for setIndex in range(0, leaders * region, region):
+                self.role[setIndex] = STATIC_LEADER
+                self.role[setIndex + region - 1] = BIMODAL_LEADER
+
+    def insertion(self, setIndex):
+        ##
+        # Every fill is a miss, so the leaders' fills move the counter
+        # @param SetIndex - of the line being filled
+        # @returns The RRPV of a newly filled line
+
+        role = self.role[setIndex]
+
+        if role == STATIC_LEADER:
+            self.selector = min(self.selectorMax, self.selector + 1)
+            return RRPV_LONG
+        if role == BIMODAL_LEADER:
+            self.selector = max(0, self.selector - 1)
+            return BimodalRRIP.insertion(self, setIndex)
+
+        if self.selector > self.selectorMiddle:
+            return BimodalRRIP.insertion(self, setIndex)
+
+        return RRPV_LONG
+
+class AdaptiveReplacement(RandomReplacement):
+    ##
+    # Adaptive replacement (ARC), run separately in every set with the set's ways as its
+    #  capacity. A set's lines are split into a recency list (T1, used once since they
+    #  came in) and a frequency list (T2, used again), each least recently used first,
+    #  and it remembers the tags of blocks recently evicted from each (the ghost lists
+    #  B1 and B2). A miss on a ghost grows the target size of T1 (a B1 ghost) or shrinks
+    #  it (a B2 ghost), and the victim comes from T1 while it is over its target.
+    # The lists are insertion ordered dicts, so moving a line to the most recently used
+    #  end and taking the least recently used one are constant time
+
+    def __init__(self, numberOfSets, associativity, valid):
+        ##
+        # @param NumberOfSets
+        # @param Associativity
+        # @param Valid - the cache's valid bits, one per line
+
+        RandomReplacement.__init__(self, numberOfSets, associativity, valid)
+
+        # The block victim was asked about, which fill puts in its line
+        self.incomingTag = 0
+        self.incomingFrequent = False
+
+        self.reset()
+
+    def reset(self):
+        ##
+        # Empties every list and ghost list
+        # @returns None
+
+        self.recent = [{} for setIndex in range(self.numberOfSets)]
+        self.frequent = [{} for setIndex in range(self.numberOfSets)]
+        self.recentGhosts = [{} for setIndex in range(self.numberOfSets)]
+        self.frequentGhosts = [{} for setIndex in range(self.numberOfSets)]
+
+        # Target size of each set's recency list
+        self.target = array('l', [0]) * self.numberOfSets
+
+        # Tag of the block in each line, which becomes its ghost when it is evicted
+        self.lineTags = array('Q', bytes(8 * self.numberOfSets * self.associativity))
+
+    def resetSet(self, setIndex):
+        ##
+        # A flush makes every block cold, so the ghosts are forgotten too
+        # @param SetIndex
+        # @returns None
+
+        self.recent[setIndex] = {}
+        self.frequent[setIndex] = {}
+        self.recentGhosts[setIndex] = {}
+        self.frequentGhosts[setIndex] = {}
+        self.target[setIndex] = 0
+
+    def touch(self, line):
+        ##
+        # A hit moves the line to the most recently used end of the frequency list
+        # @param Line - line number
+        # @returns None
+
+        setIndex = line // self.associativity
+        recent = self.recent[setIndex]
+        frequent = self.frequent[setIndex]
+
+        if line in recent:
+            del recent[line]
+        else:
+            frequent.pop(line, None)
+
+        frequent[line] = None
+
+    def fill(self, line):
+        ##
+        # A block that was a ghost goes into the frequency list, any other into the recency list
+        # @param Line - line number
+        # @returns None
+
+        setIndex = line // self.associativity
+
+        self.lineTags[line] = self.incomingTag
+        if self.incomingFrequent:
+            self.frequent[setIndex][line] = None
+        else:
+            self.recent[setIndex][line] = None
+
+    def invalidate(self, line):
+        ##
+        # An emptied line leaves both lists without becoming a ghost
+        # @param Line - line number
+        # @returns None
+
+        setIndex = line // self.associativity
+
+        self.recent[setIndex].pop(line, None)
+        self.frequent[setIndex].pop(line, None)
+
+    def victim(self, setIndex, tag):
+        ##
+        # Adapts the target to a ghost hit, trims the ghost lists, then takes the first
+        #  invalid line or replaces one
+        # @param SetIndex
+        # @param Tag - of the block coming in
+        # @returns The line number to replace
+
+        capacity = self.associativity
+        first = setIndex * capacity
+        recent = self.recent[setIndex]
+        frequent = self.frequent[setIndex]
+        recentGhosts = self.recentGhosts[setIndex]
+        frequentGhosts = self.frequentGhosts[setIndex]
+
+        invalid = self.valid.find(0, first, first + capacity)
+        inFrequentGhosts = False
+
+        self.incomingTag = tag
+        self.incomingFrequent = True
+
+        if tag in recentGhosts:
+            self.target[setIndex] = min(capacity, self.target[setIndex]
+                                        + max(len(frequentGhosts) // len(recentGhosts), 1))
+            del recentGhosts[tag]
+        elif tag in frequentGhosts:
+            self.target[setIndex] = max(0, self.target[setIndex]
+                                        - max(len(recentGhosts) // len(frequentGhosts), 1))
+            del frequentGhosts[tag]
+            inFrequentGhosts = True
+        else:
+            self.incomingFrequent = False
+
+            if len(recent) + len(recentGhosts) >= capacity:
+                if len(recent) < capacity:
+                    del recentGhosts[next(iter(recentGhosts))]
+                elif invalid < 0:
+                    # The recency list fills the set, so its oldest line goes without a ghost
+                    line = next(iter(recent))
+                    del recent[line]
+                    return line
+            elif len(recent) + len(frequent) + len(recentGhosts) + len(frequentGhosts) >= 2 * capacity:
+                del frequentGhosts[next(iter(frequentGhosts))]
+
+        if invalid >= 0:
+            return invalid
+
+        return self.replace(setIndex, inFrequentGhosts)
+
+    def replace(self, setIndex, inFrequentGhosts):
+        ##
+        # Evicts the least recently used line of the recency list while it is over its
+        #  target, otherwise of the frequency list, and remembers its tag as a ghost
+        # @param SetIndex
+        # @param InFrequentGhosts - the block coming in was a frequency list ghost
+        # @returns The line number to replace
+
+        recent = self.recent[setIndex]
+        frequent = self.frequent[setIndex]
+        target = self.target[setIndex]
+
+        if recent and (len(recent) > target or (inFrequentGhosts and len(recent) == target) or not frequent):
+            line = next(iter(recent))
+            del recent[line]
+            ghosts = self.recentGhosts[setIndex]
+        else:
+            line = next(iter(frequent))
+            del frequent[line]
+            ghosts = self.frequentGhosts[setIndex]
+
+        ghosts[self.lineTags[line]] = None
+
+        # Invalidated lines can leave the set short of lines, so the ghosts are capped too
+        if len(self.recentGhosts[setIndex]) + len(self.frequentGhosts[setIndex]) > self.associativity:
+            del ghosts[next(iter(ghosts))]
+
+        return line
+
+# Replacement policy names in menu order, so policy n is REPLACEMENT_POLICIES[n - 1]
+REPLACEMENT_POLICIES = ['random_replacement', 'least_recently_used', 'least_frequently_used', 'tree_pseudo_lru',
+                        'static_rrip', 'bimodal_rrip', 'dynamic_rrip', 'adaptive_replacement']
+
+# Replacement policy classes by name
+REPLACEMENT_CLASSES = {'random_replacement' : RandomReplacement,
+                       'least_recently_used' : LeastRecentlyUsed,
+                       'least_frequently_used' : LeastFrequentlyUsed,
+                       'tree_pseudo_lru' : TreePseudoLRU,
+                       'static_rrip' : StaticRRIP,
+                       'bimodal_rrip' : BimodalRRIP,
+                       'dynamic_rrip' : DynamicRRIP,
+                       'adaptive_replacement' : AdaptiveReplacement}
+
+def registerPolicy(name, policyClass):
+    ##
+    # Adds a replacement policy, numbered after the ones already there. A cache looks its
+    #  policy class up once when it is configured, so a registered policy costs no more
+    #  per access than a built in one
+    # @param Name - of the policy, as given to Cache
+    # @param PolicyClass - implementing the RandomReplacement interface
+    # @returns The policy's menu number
+
+    if name in REPLACEMENT_CLASSES:
+        raise ValueError('replacement policy {} is already registered'.format(name))
+
+    REPLACEMENT_POLICIES.append(name)
+    REPLACEMENT_CLASSES[name] = policyClass
+
+    return len(REPLACEMENT_POLICIES)
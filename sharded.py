@@ -0,0 +1,110 @@
+# File: sharded.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the set-sharded engine, which splits one cache's sets
+#   between processes and replays each set's accesses in parallel
+
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+import os
+
+from cache import Cache, CacheStats
+from functions import replayTrace
+from memory import Memory
+from tracefile import decodeTrace, FLUSH
+
+def shardTrace(operations, addresses, data, blockSize, numberOfSets, numberOfShards):
+    ##
+    # Splits a decoded trace by set, shard = set index % numberOfShards. Every shard keeps
+    #  its accesses in trace order and gets every cache-flush
+    # @param Operations, Addresses, Data - the decoded trace
+    # @param BlockSize - in bytes
+    # @param NumberOfSets - of the cache
+    # @param NumberOfShards
+    # @returns List of (operations, addresses, data) per shard
+
+    shards = [(bytearray(), array('Q'), bytearray()) for shard in range(numberOfShards)]
+    numberOfOffsetBits = blockSize.bit_length() - 1
+    setMask = numberOfSets - 1
+    flushCode = ord(FLUSH)
+
+    for operation, address, byte in zip(operations, addresses, data):
+        if operation == flushCode:
+            for shardOperations, shardAddresses, shardData in shards:
+                shardOperations.append(operation)
+                shardAddresses.append(address)
+                shardData.append(byte)
+            continue
+
+        shardOperations, shardAddresses, shardData = shards[((address >> numberOfOffsetBits) & setMask) % numberOfShards]
+        shardOperations.append(operation)
+        shardAddresses.append(address)
+        shardData.append(byte)
+
+    return shards
+
+def runShard(task):
+    ##
+    # Replays one shard through a cold cache on a fresh copy of the RAM
+    # @param Task - (configuration, addressWidth, replacementOptions, writeBackOnFlush, image,
+    #  operations, addresses, data)
+    # @returns CacheStats of the shard's sets
+
+    configuration, addressWidth, replacementOptions, writeBackOnFlush, image, operations, addresses, data = task
+
+    memory = Memory(size=len(image))
+    memory.writeBlock(0, image)
+
+    cache = Cache(memory, *configuration, addressWidth=addressWidth, replacementOptions=replacementOptions)
+    cache.writeBackOnFlush = writeBackOnFlush
+    replayTrace(cache, operations, addresses, data)
+
+    return cache.stats()
+
+def simulateSharded(memory, traceFile, cacheSize, blockSize, associativity,
+                    replacementPolicy='least_recently_used', writeHitPolicy='write_back',
+                    writeMissPolicy='write_allocate', addressWidth=8, replacementOptions=None,
+                    workers=None, seed=0, writeBackOnFlush=False):
+    ##
+    # Replays a trace through one cache with its sets split between processes. Sets never
+    #  share blocks, lines or RAM bytes, so the totals are the same as a serial replay's.
+    #  Random replacement is given seed so every set draws from its own generator, and a
+    #  serial Cache with replacementOptions={'seed' : seed} makes the same choices.
+    #  dynamic_rrip is refused, as its set dueling lets every set's misses steer the others
+    # @param Memory - the RAM the cache starts from (it is not changed)
+    # @param TraceFile - trace file name
+    # @param CacheSize, BlockSize, Associativity, ReplacementPolicy, WriteHitPolicy,
+    #  WriteMissPolicy, AddressWidth, ReplacementOptions - as for Cache
+    # @param Workers - number of processes, the number of CPUs by default
+    # @param Seed - per-set random seed for random replacement
+    # @param WriteBackOnFlush - write the dirty lines back to the RAM on cache-flush
+    # @returns CacheStats for the trace
+
+    # Check the configuration before starting any process
+    probe = Cache(Memory(size=1), cacheSize, blockSize, associativity, replacementPolicy,
+                  writeHitPolicy, writeMissPolicy, addressWidth, replacementOptions)
+
+    if probe.replacementPolicy == 'dynamic_rrip':
+        raise ValueError('dynamic_rrip duels across sets, so its sets cannot be sharded')
+
+    replacementOptions = dict(replacementOptions or {})
+    if probe.replacementPolicy == 'random_replacement':
+        replacementOptions.setdefault('seed', seed)
+
+    configuration = (cacheSize, blockSize, associativity, replacementPolicy, writeHitPolicy, writeMissPolicy)
+    image = bytes(memory.RAM)
+    numberOfShards = min(workers or os.cpu_count() or 1, probe.numberOfSets)
+
+    shards = shardTrace(*decodeTrace(traceFile), blockSize, probe.numberOfSets, numberOfShards)
+    tasks = [(configuration, addressWidth, replacementOptions, writeBackOnFlush, image) + shard for shard in shards]
+
+    if numberOfShards == 1:
+        results = [runShard(tasks[0])]
+    else:
+        with ProcessPoolExecutor(numberOfShards) as pool:
+            results = list(pool.map(runShard, tasks))
+
+    return CacheStats(*(sum(counts) for counts in zip(*results)))
@@ -0,0 +1,257 @@
+# File: stackdistance.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains a stack distance analyzer that works out the least recently
+#   used miss ratio of every cache size from a single pass over a trace
+
+from array import array
+from collections import namedtuple
+
+from tracefile import readTrace, FLUSH
+
+# One cache size of a miss ratio curve
+CurvePoint = namedtuple('CurvePoint', ['cacheSize', 'misses', 'missRatio'])
+
+class ReuseDistanceTree:
+    ##
+    # Works out the stack distance of each access: how many other blocks were used
+    #  since the block was last used, or -1 the first time it is used.
+    # Every block marks the time of its last use in a Fenwick (binary indexed) tree,
+    #  so the distance is the number of marks after that time, found in log time.
+    #  When the times run out the marks are renumbered 1..number of blocks
+
+    def __init__(self, capacity=1 << 16):
+        ##
+        # @param Capacity - number of times before the first renumbering
+
+        self.capacity = capacity
+        self.reset()
+
+    def reset(self):
+        ##
+        # Forgets every block
+        # @returns None
+
+        self.tree = array('q', bytes(8 * (self.capacity + 1)))
+        # Block -> time of its last use
+        self.last = {}
+        self.time = 0
+
+    def add(self, time, amount):
+        ##
+        # @param Time - position in the tree, from 1
+        # @param Amount - added to the mark at time
+        # @returns None
+
+        tree = self.tree
+        size = len(tree)
+
+        while time < size:
+            tree[time] += amount
+            time += time & -time
+
+    def marksUpTo(self, time):
+        ##
+        # @param Time - position in the tree, from 1
+        # @returns The number of marks at times 1..time
+
+        tree = self.tree
+        total = 0
+
+        while time:
+            total += tree[time]
+            time &= time - 1
+
+        return total
+
+    def compact(self):
+        ##
+        # Renumbers the marks 1..number of blocks in last use order, growing the
+        #  tree so at least half of it is free afterwards
+        # @returns None
+
+        blocks = sorted(self.last, key=self.last.get)
+        size = max(self.capacity, 2 * len(blocks)) + 1
+
+        # Build the tree of all ones in linear time by pushing each node into its parent
+        tree = array('q', bytes(8 * size))
+        for time in range(1, size):
+            if time <= len(blocks):
+                tree[time] += 1
+            parent = time + (time & -time)
+            if parent < size:
+                tree[parent] += tree[time]
+
+        self.tree = tree
+        self.last = {block : time for time, block in enumerate(blocks, 1)}
+        self.time = len(blocks)
+
+    def forget(self, block):
+        ##
+        # Stops tracking a block, as if it had never been used
+        # @param Block - block number
+        # @returns None
+
+        self.add(self.last.pop(block), -1)
+
+    def distance(self, block):
+        ##
+        # Records a use of block
+        # @param Block - block number
+        # @returns The stack distance of the use, -1 for the first use
+
+        if self.time + 1 >= len(self.tree):
+            self.compact()
+
+        last = self.last.get(block)
+
+        if last is None:
+            distance = -1
+        else:
+            # Every block has exactly one mark, so the marks after last are the rest
+            distance = len(self.last) - self.marksUpTo(last)
+            self.add(last, -1)
+
+        self.time += 1
+        self.add(self.time, 1)
+        self.last[block] = self.time
+
+        return distance
+
+class MissRatioCurve:
+    ##
+    # Counts the least recently used misses of every power of two cache size from
+    #  blockSize * associativity up to maxCacheSize in one pass over a trace.
+    # Fully associative caches (associativity 0) use Mattson's stack algorithm: an access
+    #  hits in every cache with more lines than its stack distance, so one distance per
+    #  access covers all sizes. With a fixed associativity the sizes differ in their number
+    #  of sets, and an access hits when it is among the last associativity blocks used in
+    #  its set, so each number of sets keeps a stack that deep per set.
+    # Blocks and sets are split off addresses the same way Cache.expandAddress does. Every
+    #  access, read or write, allocates and counts as a use, so it matches Cache with
+    #  least_recently_used and write_allocate on read-only traces (Cache only updates
+    #  recency on read hits)
+
+    def __init__(self, blockSize, associativity=0, maxCacheSize=1 << 20):
+        ##
+        # @param BlockSize - in bytes
+        # @param Associativity - 0 for fully associative
+        # @param MaxCacheSize - largest cache size in bytes
+
+        if blockSize < 1 or blockSize & (blockSize - 1) or maxCacheSize & (maxCacheSize - 1):
+            raise ValueError('cache and block sizes must be powers of two')
+        if associativity < 0 or associativity & (associativity - 1):
+            raise ValueError('associativity must be a power of two, or 0 for fully associative')
+        if blockSize * max(1, associativity) > maxCacheSize:
+            raise ValueError('the largest cache cannot hold a single set')
+
+        self.blockSize = blockSize
+        self.associativity = associativity
+        self.maxCacheSize = maxCacheSize
+        self.numberOfOffsetBits = blockSize.bit_length() - 1
+
+        # Number of cache sizes on the curve
+        self.numberOfSizes = (maxCacheSize // (blockSize * max(1, associativity))).bit_length()
+
+        self.accesses = 0
+
+        if associativity == 0:
+            self.tree = ReuseDistanceTree()
+            # Hits of a 2**k line cache that every smaller size missed, by k
+            self.hits = array('Q', bytes(8 * self.numberOfSizes))
+        else:
+            # Misses of the cache with 2**k sets, by k
+            self.misses = array('Q', bytes(8 * self.numberOfSizes))
+
+        self.reset()
+
+    def reset(self):
+        ##
+        # Makes every cache cold, keeping the counts so far
+        # @returns None
+
+        if self.associativity == 0:
+            self.tree.reset()
+        else:
+            # Per number of sets (2**k): set index -> its last blocks in use order
+            self.stacks = [{} for k in range(self.numberOfSizes)]
+
+    def access(self, address):
+        ##
+        # Records one access
+        # @param Address - as an integer
+        # @returns None
+
+        block = address >> self.numberOfOffsetBits
+        self.accesses += 1
+
+        if self.associativity == 0:
+            # A distance of d hits in caches of more than d lines, so the 2**k line
+            #  caches with d < 2**k, the smallest being k = bit length of d
+            distance = self.tree.distance(block)
+            if 0 <= distance and distance.bit_length() < self.numberOfSizes:
+                self.hits[distance.bit_length()] += 1
+            return
+
+        associativity = self.associativity
+        misses = self.misses
+
+        for k, sets in enumerate(self.stacks):
+            setIndex = block & ((1 << k) - 1)
+            stack = sets.get(setIndex)
+
+            if stack is None:
+                stack = sets[setIndex] = {}
+
+            # Dicts keep insertion order, so the first key is the least recently used
+            if block in stack:
+                del stack[block]
+            else:
+                misses[k] += 1
+                if len(stack) == associativity:
+                    del stack[next(iter(stack))]
+
+            stack[block] = None
+
+    def curve(self):
+        ##
+        # @returns List of CurvePoint, smallest cache first
+
+        lineSize = self.blockSize * max(1, self.associativity)
+        points = []
+        hits = 0
+
+        for k in range(self.numberOfSizes):
+            if self.associativity == 0:
+                hits += self.hits[k]
+                misses = self.accesses - hits
+            else:
+                misses = self.misses[k]
+
+            points.append(CurvePoint(lineSize << k, misses,
+                                     misses / self.accesses if self.accesses else 0.0))
+
+        return points
+
+def traceMissRatioCurve(filename, blockSize, associativity=0, maxCacheSize=1 << 20):
+    ##
+    # Runs a whole trace file through a MissRatioCurve. A cache-flush makes every size cold
+    # @param filename - of the trace file, in the syntax readTrace takes
+    # @param BlockSize - in bytes
+    # @param Associativity - 0 for fully associative
+    # @param MaxCacheSize - largest cache size in bytes
+    # @returns List of CurvePoint, smallest cache first
+
+    curve = MissRatioCurve(blockSize, associativity, maxCacheSize)
+    access = curve.access
+
+    for operation, address, byte, core in readTrace(filename):
+        if operation == FLUSH:
+            curve.reset()
+        else:
+            access(address)
+
+    return curve.curve()
@@ -0,0 +1,252 @@
+# File: sweep.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the design space sweep, which replays one trace through
+#   every combination of cache parameters on a pool of processes
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from multiprocessing import shared_memory
+import argparse
+import csv
+import json
+import random
+import sys
+
+from cache import (Cache, policyName, REPLACEMENT_POLICIES, WRITE_HIT_POLICIES,
+                   WRITE_MISS_POLICIES)
+from functions import replayTrace
+from memory import Memory, MEMORY_FORMATS
+from tracefile import decodeTrace
+
+# One row of the sweep table
+SweepResult = namedtuple('SweepResult', ['cacheSize', 'blockSize', 'associativity',
+                                         'replacementPolicy', 'writeHitPolicy', 'writeMissPolicy',
+                                         'hits', 'misses', 'evictions', 'writeBacks'])
+
+SWEEP_FORMATS = ['csv', 'json']
+
+# What each worker process sets up once and every configuration it runs reuses
+workerState = {}
+
+def sweepConfigurations(cacheSizes, blockSizes, associativities, replacementPolicies,
+                        writeHitPolicies, writeMissPolicies, addressWidth=8):
+    ##
+    # Combines the parameter ranges, leaving out the caches that cannot be built (sizes
+    #  that are not powers of two, blocks bigger than the cache, more ways than lines,
+    #  set and offset bits that do not fit the address width, ...)
+    # @param CacheSizes - list of sizes in bytes
+    # @param BlockSizes - list of sizes in bytes
+    # @param Associativities - list, 0 for fully associative
+    # @param ReplacementPolicies - list of numbers or names
+    # @param WriteHitPolicies - list of numbers or names
+    # @param WriteMissPolicies - list of numbers or names
+    # @param AddressWidth - number of bits in an address
+    # @returns List of (cacheSize, blockSize, associativity, replacementPolicy,
+    #  writeHitPolicy, writeMissPolicy) with the policies by name
+
+    replacementPolicies = [policyName(policy, REPLACEMENT_POLICIES) for policy in replacementPolicies]
+    writeHitPolicies = [policyName(policy, WRITE_HIT_POLICIES) for policy in writeHitPolicies]
+    writeMissPolicies = [policyName(policy, WRITE_MISS_POLICIES) for policy in writeMissPolicies]
+
+    configurations = []
+
+    for cacheSize, blockSize, associativity, *policies in product(cacheSizes, blockSizes, associativities,
+                                                                  replacementPolicies, writeHitPolicies,
+                                                                  writeMissPolicies):
+        # Building the cache once is the one check that matches what the workers will do
+        try:
+            Cache(Memory(size=1), cacheSize, blockSize, associativity, *policies, addressWidth=addressWidth)
+        except ValueError:
+            continue
+        configurations.append((cacheSize, blockSize, associativity, *policies))
+
+    return configurations
+
+def initializeWorker(operations, addresses, data, image, addressWidth, seed):
+    ##
+    # Keeps the trace and the starting RAM contents for runConfiguration
+    # @param Operations, Addresses, Data - the decoded trace
+    # @param Image - bytes of the RAM before the trace
+    # @param AddressWidth - number of bits in an address
+    # @param Seed - random seed set before every configuration, None to leave it
+    # @returns None
+
+    workerState.update(operations=operations, addresses=addresses, data=data, image=image,
+                       addressWidth=addressWidth, seed=seed)
+
+def attachWorker(sharedName, length, image, addressWidth, seed):
+    ##
+    # Pool initializer: maps the trace the parent decoded into shared memory, so
+    #  no worker parses or copies it
+    # @param SharedName - name of the shared memory block
+    # @param Length - number of accesses in the trace
+    # @param Image, AddressWidth, Seed - as for initializeWorker
+    # @returns None
+
+    block = shared_memory.SharedMemory(name=sharedName)
+    view = block.buf
+
+    # The block holds the addresses, then the operations, then the data bytes
+    workerState['block'] = block
+    initializeWorker(view[8 * length:9 * length], view[:8 * length].cast('Q'),
+                     view[9 * length:10 * length], image, addressWidth, seed)
+
+def runConfiguration(configuration):
+    ##
+    # Replays the worker's trace through one cold cache on a fresh copy of the RAM
+    # @param Configuration - one tuple from sweepConfigurations
+    # @returns SweepResult
+
+    memory = Memory(size=len(workerState['image']))
+    memory.writeBlock(0, workerState['image'])
+
+    if workerState['seed'] is not None:
+        random.seed(workerState['seed'])
+
+    cache = Cache(memory, *configuration, addressWidth=workerState['addressWidth'])
+    replayTrace(cache, workerState['operations'], workerState['addresses'], workerState['data'])
+
+    return SweepResult(*configuration, *cache.stats())
+
+def runSweep(memory, traceFile, configurations, workers=None, addressWidth=8, seed=None):
+    ##
+    # Replays a trace through every configuration. The trace is decoded once and put in
+    #  shared memory for the worker processes
+    # @param Memory - the RAM every configuration starts from (it is not changed)
+    # @param TraceFile - trace file name
+    # @param Configurations - list of tuples from sweepConfigurations
+    # @param Workers - number of processes, the number of CPUs by default, 1 to run
+    #  everything in this process
+    # @param AddressWidth - number of bits in an address
+    # @param Seed - random seed set before every configuration, None to leave it
+    # @returns List of SweepResult in the order of configurations
+
+    operations, addresses, data = decodeTrace(traceFile)
+    image = bytes(memory.RAM)
+
+    if workers == 1:
+        initializeWorker(operations, addresses, data, image, addressWidth, seed)
+        return [runConfiguration(configuration) for configuration in configurations]
+
+    length = len(operations)
+    block = shared_memory.SharedMemory(create=True, size=max(1, 10 * length))
+
+    try:
+        block.buf[:8 * length] = memoryview(addresses).cast('B')
+        block.buf[8 * length:9 * length] = operations
+        block.buf[9 * length:10 * length] = data
+
+        with ProcessPoolExecutor(workers, initializer=attachWorker,
+                                 initargs=(block.name, length, image, addressWidth, seed)) as pool:
+            return list(pool.map(runConfiguration, configurations))
+    finally:
+        block.close()
+        block.unlink()
+
+def writeResults(results, ofs, fileFormat='csv'):
+    ##
+    # Writes the sweep table
+    # @param Results - list of SweepResult
+    # @param ofs - text file to write to
+    # @param FileFormat - 'csv' or 'json'
+    # @returns None
+
+    if fileFormat == 'csv':
+        writer = csv.writer(ofs)
+        writer.writerow(SweepResult._fields)
+        writer.writerows(results)
+    elif fileFormat == 'json':
+        json.dump([result._asdict() for result in results], ofs, indent=2)
+        ofs.write('\n')
+    else:
+        raise ValueError('sweep format must be one of {}'.format(', '.join(SWEEP_FORMATS)))
+
+def sizeRange(text):
+    ##
+    # @param Text - a size, or 'low:high' for every power of two from low to high. A low
+    #  of 0 (a fully associative cache) is given once before the powers from 1
+    # @returns List of sizes
+
+    if ':' not in text:
+        return [int(text)]
+
+    low, high = (int(size) for size in text.split(':'))
+    sizes = []
+
+    if low < 0:
+        raise ValueError('a size range cannot start below 0')
+    if low == 0:
+        sizes.append(0)
+        low = 1
+
+    while low <= high:
+        sizes.append(low)
+        low *= 2
+
+    return sizes
+
+def policyNames(policies, names):
+    ##
+    # @param Policies - list of numbers or names as typed on the command line
+    # @param Names - list of policy names in menu order
+    # @returns List of policy names
+
+    return [policyName(int(policy) if policy.isdigit() else policy, names) for policy in policies]
+
+def main():
+    ##
+    # Driver function for the design space sweep
+
+    parser = argparse.ArgumentParser(description='Cache design space sweep')
+    parser.add_argument('memory', help='memory image the RAM of every configuration starts from')
+    parser.add_argument('trace', help='trace file replayed through every configuration')
+    parser.add_argument('--cache-sizes', type=sizeRange, nargs='+', default=[[32]],
+                        help='sizes in bytes, or low:high for every power of two in between')
+    parser.add_argument('--block-sizes', type=sizeRange, nargs='+', default=[[8]])
+    parser.add_argument('--associativities', type=sizeRange, nargs='+', default=[[1]],
+                        help='0 for fully associative')
+    parser.add_argument('--replacement-policies', nargs='+', default=['1', '2', '3'])
+    parser.add_argument('--write-hit-policies', nargs='+', default=['1', '2'])
+    parser.add_argument('--write-miss-policies', nargs='+', default=['1', '2'])
+    parser.add_argument('--address-width', type=int, default=8)
+    parser.add_argument('--memory-size', type=int, default=256, help='RAM size in bytes')
+    parser.add_argument('--memory-format', choices=MEMORY_FORMATS)
+    parser.add_argument('--workers', type=int, help='number of processes, the number of CPUs by default')
+    parser.add_argument('--seed', type=int, help='random seed for random replacement')
+    parser.add_argument('--output', help='file to write the table to, the console by default')
+    parser.add_argument('--format', choices=SWEEP_FORMATS,
+                        help='table format, json for .json outputs and csv otherwise by default')
+    arguments = parser.parse_args()
+
+    try:
+        configurations = sweepConfigurations(
+            [size for sizes in arguments.cache_sizes for size in sizes],
+            [size for sizes in arguments.block_sizes for size in sizes],
+            [size for sizes in arguments.associativities for size in sizes],
+            policyNames(arguments.replacement_policies, REPLACEMENT_POLICIES),
+            policyNames(arguments.write_hit_policies, WRITE_HIT_POLICIES),
+            policyNames(arguments.write_miss_policies, WRITE_MISS_POLICIES), arguments.address_width)
+        memory = Memory(arguments.memory, size=arguments.memory_size, fileFormat=arguments.memory_format)
+        results = runSweep(memory, arguments.trace, configurations, arguments.workers,
+                           arguments.address_width, arguments.seed)
+    except (ValueError, IndexError) as error:
+        raise SystemExit('Error, {}'.format(error))
+
+    fileFormat = arguments.format
+    if fileFormat is None:
+        fileFormat = 'json' if arguments.output and arguments.output.endswith('.json') else 'csv'
+
+    if arguments.output is None:
+        writeResults(results, sys.stdout, fileFormat)
+    else:
+        ofs = open(arguments.output, 'w', newline='')
+        writeResults(results, ofs, fileFormat)
+        ofs.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# File: timeseries.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the time series counters, which write the hit rate, miss rate,
+#   evictions, write backs and RAM traffic of every window of N accesses to a CSV or
+#   columnar file
+
+from array import array
+import struct
+import sys
+
+# The columns of a time series, one row per window
+SERIES_COLUMNS = ['window', 'accesses', 'hits', 'misses', 'hit_rate', 'miss_rate', 'evictions', 'write_backs',
+                  'ram_bytes_read', 'ram_bytes_written']
+
+# Typecode of each column in a columnar file: the rates are doubles, the counts 64 bit integers
+SERIES_TYPECODES = ['q', 'q', 'q', 'q', 'd', 'd', 'q', 'q', 'q', 'q']
+
+SERIES_FORMATS = ['csv', 'columnar']
+
+# A columnar series is an 8 byte header (magic, version, 3 reserved bytes), the number
+#  of columns and rows, then each column in turn: its name, its typecode and the raw
+#  little-endian values of every row
+SERIES_MAGIC = b'CSER'
+SERIES_VERSION = 1
+SERIES_HEADER = struct.Struct('<4sB3xIQ')
+
+# Size of the write buffer of a series file
+SERIES_BUFFER_SIZE = 1 << 20
+
+class CsvSeriesWriter:
+    ##
+    # Writes one line per window, after a header line of the column names
+
+    def __init__(self, ofs):
+        ##
+        # @param ofs - text file to write the series to
+
+        self.ofs = ofs
+        ofs.write(','.join(SERIES_COLUMNS) + '\n')
+
+    def write(self, row):
+        ##
+        # @param Row - one value per column
+        # @returns None
+
+        self.ofs.write('{},{},{},{},{:.6f},{:.6f},{},{},{},{}\n'.format(*row))
+
+    def close(self):
+        ##
+        # Writes out whatever is still buffered and closes the file
+        # @returns None
+
+        self.ofs.close()
+
+class ColumnarSeriesWriter:
+    ##
+    # Keeps each column in its own array and writes them one after the other on close,
+    #  so a reader can load any column without parsing the others
+
+    def __init__(self, ofs):
+        ##
+        # @param ofs - binary file to write the series to
+
+        self.ofs = ofs
+        self.columns = [array(typecode) for typecode in SERIES_TYPECODES]
+
+    def write(self, row):
+        ##
+        # @param Row - one value per column
+        # @returns None
+
+        for column, value in zip(self.columns, row):
+            column.append(value)
+
+    def close(self):
+        ##
+        # Writes the columns and closes the file
+        # @returns None
+
+        self.ofs.write(SERIES_HEADER.pack(SERIES_MAGIC, SERIES_VERSION, len(self.columns), len(self.columns[0])))
+
+        for name, column in zip(SERIES_COLUMNS, self.columns):
+            if sys.byteorder == 'big':
+                column.byteswap()
+            self.ofs.write(bytes([len(name)]) + name.encode('ascii') + column.typecode.encode('ascii'))
+            self.ofs.write(column.tobytes())
+
+        self.ofs.close()
+
+def openSeriesWriter(filename, fileFormat=None):
+    ##
+    # Opens a time series file behind a large write buffer
+    # @param filename - of the series, '-' for the console
+    # @param FileFormat - 'csv' or 'columnar', columnar for .col and csv otherwise by default
+    # @returns CsvSeriesWriter or ColumnarSeriesWriter
+
+    if fileFormat is None:
+        fileFormat = 'columnar' if filename.endswith('.col') else 'csv'
+
+    if fileFormat not in SERIES_FORMATS:
+        raise ValueError('series format must be one of {}'.format(', '.join(SERIES_FORMATS)))
+
+    # The console gets its own buffer, which closing the writer leaves open
+    if filename == '-':
+        sys.stdout.flush()
+        filename = sys.stdout.fileno()
+
+    if fileFormat == 'columnar':
+        return ColumnarSeriesWriter(open(filename, 'wb', buffering=SERIES_BUFFER_SIZE,
+                                         closefd=not isinstance(filename, int)))
+
+    return CsvSeriesWriter(open(filename, 'w', buffering=SERIES_BUFFER_SIZE, newline='',
+                                closefd=not isinstance(filename, int)))
+
+def readColumns(filename):
+    ##
+    # Reads a columnar time series
+    # @param filename - of the series
+    # @returns Dict of column name -> array of its values, in file order
+
+    ifs = open(filename, 'rb')
+    contents = ifs.read()
+    ifs.close()
+
+    if len(contents) < SERIES_HEADER.size:
+        raise ValueError('{} is not a version {} time series'.format(filename, SERIES_VERSION))
+
+    magic, version, numberOfColumns, numberOfRows = SERIES_HEADER.unpack_from(contents)
+
+    if magic != SERIES_MAGIC or version != SERIES_VERSION:
+        raise ValueError('{} is not a version {} time series'.format(filename, SERIES_VERSION))
+
+    columns = {}
+    offset = SERIES_HEADER.size
+
+    for _ in range(numberOfColumns):
+        if offset >= len(contents):
+            raise ValueError('{} ends in the middle of a column'.format(filename))
+
+        length = contents[offset]
+        name = contents[offset + 1:offset + 1 + length].decode('ascii')
+        column = array(chr(contents[offset + 1 + length]))
+        offset += length + 2
+
+        end = offset + numberOfRows * column.itemsize
+        if end > len(contents):
+            raise ValueError('{} ends in the middle of a column'.format(filename))
+
+        column.frombytes(contents[offset:end])
+        if sys.byteorder == 'big':
+            column.byteswap()
+
+        columns[name] = column
+        offset = end
+
+    return columns
+
+class TimeSeries:
+    ##
+    # Samples the counters of a run at the end of every window of windowSize accesses and
+    #  writes how much each one grew. The replay loops only compare the access count with
+    #  boundary, the count the current window ends at, and call sample when they match.
+    #  The hits, misses, evictions and write backs are summed over the caches given, and the
+    #  RAM traffic is what the memory handed out and took back
+
+    def __init__(self, caches, memory, windowSize, writer, start=0):
+        ##
+        # @param Caches - the caches whose statistics to sum, e.g. the first level of a hierarchy
+        # @param Memory - the RAM under them
+        # @param WindowSize - accesses per window
+        # @param Writer - CsvSeriesWriter or ColumnarSeriesWriter
+        # @param Start - number of trace accesses already replayed, so windows line up with
+        #  those of a run from the start of the trace
+
+        if windowSize < 1:
+            raise ValueError('the series window must be at least 1 access')
+
+        self.caches = caches
+        self.memory = memory
+        self.windowSize = windowSize
+        self.writer = writer
+
+        self.window = start // windowSize
+        self.boundary = (self.window + 1) * windowSize
+        self.last = start
+        self.previous = self.counters()
+
+    def counters(self):
+        ##
+        # @returns The running hits, misses, evictions, write backs, RAM bytes read and RAM
+        #  bytes written
+
+        hits = misses = evictions = writeBacks = 0
+
+        for cache in self.caches:
+            hits += cache.hits
+            misses += cache.misses
+            evictions += cache.evictions
+            writeBacks += cache.writeBacks
+
+        return (hits, misses, evictions, writeBacks, self.memory.bytesRead, self.memory.bytesWritten)
+
+    def writeWindow(self, number):
+        ##
+        # Writes the window ending at access number
+        # @param Number - of accesses replayed so far
+        # @returns None
+
+        counters = self.counters()
+        hits, misses, evictions, writeBacks, bytesRead, bytesWritten = (
+            now - before for now, before in zip(counters, self.previous))
+        lookups = hits + misses
+
+        self.writer.write((self.window, number - self.last, hits, misses, hits / lookups if lookups else 0.0,
+                           misses / lookups if lookups else 0.0, evictions, writeBacks, bytesRead, bytesWritten))
+
+        self.window += 1
+        self.last = number
+        self.previous = counters
+
+    def sample(self, number):
+        ##
+        # Ends the current window
+        # @param Number - of accesses replayed so far, boundary
+        # @returns The access count the next window ends at
+
+        self.writeWindow(number)
+        self.boundary = number + self.windowSize
+
+        return self.boundary
+
+    def close(self, position=None):
+        ##
+        # Writes the last window if it has any accesses, then closes the file
+        # @param Position - number of accesses replayed in all, None to write no last window
+        # @returns None
+
+        if position is not None and position > self.last:
+            self.writeWindow(position)
+
+        self.writer.close()
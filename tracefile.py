@@ -0,0 +1,571 @@
+# File: tracefile.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains the readers for the trace files replayed in batch mode,
+#   the packed binary trace format and the converters to it
+
+from array import array
+from itertools import islice
+import argparse
+import bz2
+import gzip
+import io
+import lzma
+import mmap
+import queue
+import struct
+import sys
+import threading
+
+# Trace operations
+READ = 'r'
+WRITE = 'w'
+FLUSH = 'f'
+FETCH = 'i'
+
+TRACE_FORMATS = ['text', 'binary', 'dinero', 'lackey']
+
+# A binary trace is an 8 byte header (magic, version, flags, 2 reserved bytes) followed
+#  by fixed width little-endian records: address (8 bytes), operation letter, data byte
+#  and, when flag 1 is set, the core number (2 bytes)
+BINARY_MAGIC = b'CTRC'
+BINARY_VERSION = 1
+BINARY_HEADER_SIZE = 8
+BINARY_CORES = 1
+BINARY_RECORDS = [struct.Struct('<QBB'), struct.Struct('<QBBH')]
+
+# Compression codecs by the magic their streams start with
+COMPRESSIONS = [(b'\x1f\x8b', gzip), (b'BZh', bz2), (b'\xfd7zXZ\x00', lzma)]
+COMPRESSED_EXTENSIONS = ['.gz', '.bz2', '.xz']
+
+# Bytes of a compressed binary trace decompressed at a time, in records
+BINARY_CHUNK_RECORDS = 1 << 14
+
+# Dinero din labels
+DINERO_OPERATIONS = {'0' : READ, '1' : WRITE, '2' : FETCH, '4' : FLUSH}
+
+# Bytes of a trace looked at to guess its format
+TRACE_PEEK_SIZE = 4096
+
+def openTrace(filename):
+    ##
+    # Opens a trace for reading, decompressing gzip, bzip2 and xz streams on the fly
+    # @param filename - of the trace file, '-' for the standard input
+    # @returns Binary stream of the (decompressed) trace
+
+    if filename == '-':
+        stream = sys.stdin.buffer
+    else:
+        stream = open(filename, 'rb')
+
+    # Peeking leaves the magic in the stream for the decompressor
+    magic = stream.peek(8)
+
+    for prefix, codec in COMPRESSIONS:
+        if magic.startswith(prefix):
+            return codec.open(stream, 'rb')
+
+    return stream
+
+def guessTraceFormat(filename, stream=None):
+    ##
+    # Picks the trace format from the trace's first bytes and its extension
+    # @param filename
+    # @param Stream - the trace already opened with openTrace, opened here by default
+    # @returns 'binary' for traces starting with the binary magic, 'dinero' for .din,
+    #  'lackey' for .lackey, otherwise the format the first line looks like (see
+    #  guessTextFormat), so a piped trace needs no extension. A compression extension
+    #  is ignored
+
+    if stream is None:
+        ifs = openTrace(filename)
+        head = ifs.peek(TRACE_PEEK_SIZE)
+        ifs.close()
+    else:
+        head = stream.peek(TRACE_PEEK_SIZE)
+
+    if head[:len(BINARY_MAGIC)] == BINARY_MAGIC:
+        return 'binary'
+
+    name = filename.lower()
+    for extension in COMPRESSED_EXTENSIONS:
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+
+    extension = name[name.rfind('.'):]
+
+    if extension == '.din':
+        return 'dinero'
+    if extension == '.lackey':
+        return 'lackey'
+
+    return guessTextFormat(head)
+
+def guessTextFormat(head):
+    ##
+    # Tells the line based formats apart by their first access. Lackey lines are a
+    #  capital I, L, S or M and 'address,size' (or a Valgrind '==' line), Dinero lines a
+    #  numeric label and an address, and anything else is left to the text trace reader
+    # @param Head - the first bytes of the (decompressed) trace
+    # @returns 'lackey', 'dinero' or 'text'
+
+    lines = head.decode('ascii', 'replace').splitlines()
+
+    # The last line may be cut short, unless it is the only one
+    if len(lines) > 1 and not head.endswith(b'\n'):
+        lines.pop()
+
+    for line in lines:
+        fields = line.split()
+
+        if not fields or fields[0][0] == '#':
+            continue
+
+        if fields[0].startswith('=='):
+            return 'lackey'
+        if len(fields) == 2 and fields[0] in ('I', 'L', 'S', 'M') and ',' in fields[1]:
+            return 'lackey'
+        if fields[0] in DINERO_OPERATIONS or fields[0] == '3':
+            return 'dinero'
+
+        return 'text'
+
+    return 'text'
+
+def readTrace(filename, traceFormat=None, background=False, start=0):
+    ##
+    # Streams the accesses of a trace file, so its size does not matter. The trace may be
+    #  compressed and may come from the standard input
+    # @param filename - of the trace file, '-' for the standard input
+    # @param TraceFormat - 'text', 'binary', 'dinero' or 'lackey', guessed by default
+    # @param Background - decompress and parse on a background thread (see PrefetchedTrace)
+    # @param Start - number of accesses to skip, which a plain binary trace seeks past
+    # @returns Iterable of (operation, address, byte, core) per access, with -1 for the
+    #  fields an operation does not have
+
+    stream = openTrace(filename)
+
+    if traceFormat is None:
+        traceFormat = guessTraceFormat(filename, stream)
+
+    if traceFormat not in TRACE_FORMATS:
+        stream.close()
+        raise ValueError('trace format must be one of {}'.format(', '.join(TRACE_FORMATS)))
+
+    if traceFormat == 'binary':
+        # A plain binary file is mapped instead of read
+        if isinstance(stream, io.BufferedReader) and filename != '-':
+            stream.close()
+            accesses = readBinaryTrace(filename, start)
+            start = 0
+        else:
+            accesses = readBinaryStream(stream, filename)
+    else:
+        lines = io.TextIOWrapper(stream)
+
+        if traceFormat == 'text':
+            accesses = readTextTrace(lines, filename)
+        elif traceFormat == 'dinero':
+            accesses = readDineroTrace(lines, filename)
+        else:
+            accesses = readLackeyTrace(lines, filename)
+
+    if start:
+        accesses = skipAccesses(accesses, start)
+
+    if background:
+        return PrefetchedTrace(accesses)
+
+    return accesses
+
+def skipAccesses(accesses, count):
+    ##
+    # @param Accesses - generator of accesses
+    # @param Count - number of accesses to skip
+    # @returns Generator of the accesses after the first count
+
+    try:
+        yield from islice(accesses, count, None)
+    finally:
+        accesses.close()
+
+def readTextTrace(ifs, filename):
+    ##
+    # Streams a text trace one line at a time.
+    # Each line holds one access, either in the menu syntax ('cache-read 0x18',
+    #  'cache-write 0x18 0xAB', 'cache-flush') or the short form ('r 18', 'w 18 AB', 'f').
+    #  Instruction fetches are 'cache-fetch 0x18' or 'i 18'. An access may start with the
+    #  number of the core making it ('1: w 18 AB'), otherwise it is core 0's. Blank lines
+    #  and lines starting with '#' are skipped
+    # @param ifs - text stream of the trace, closed at the end
+    # @param filename - of the trace file, for error messages
+    # @returns Generator of (operation, address, byte, core) per access, with -1 for the
+    #  fields an operation does not have
+
+    try:
+        for lineNumber, line in enumerate(ifs, 1):
+            fields = line.split()
+
+            # Skip blank lines and comments
+            if not fields or fields[0][0] == '#':
+                continue
+
+            core = 0
+            if fields[0][-1] == ':':
+                core = int(fields[0][:-1])
+                fields = fields[1:]
+
+            operation = fields[0].lower()
+
+            if operation == 'r' or operation == 'cache-read':
+                yield READ, int(fields[1], 16), -1, core
+            elif operation == 'w' or operation == 'cache-write':
+                yield WRITE, int(fields[1], 16), int(fields[2], 16), core
+            elif operation == 'i' or operation == 'cache-fetch':
+                yield FETCH, int(fields[1], 16), -1, core
+            elif operation == 'f' or operation == 'cache-flush':
+                yield FLUSH, -1, -1, core
+            else:
+                raise ValueError('{}:{}: unknown trace operation {}'.format(filename, lineNumber, fields[0]))
+    finally:
+        ifs.close()
+
+def readBinaryTrace(filename, start=0):
+    ##
+    # Streams a binary trace straight out of a memory mapping of the file, unpacking the
+    #  records in place without copying them
+    # @param filename - of the trace file
+    # @param Start - number of records to skip
+    # @returns Generator of (operation, address, byte, core) per access
+
+    ifs = open(filename, 'rb')
+    mapping = mmap.mmap(ifs.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    records = view[BINARY_HEADER_SIZE:]
+    unpacked = None
+
+    try:
+        if view[:len(BINARY_MAGIC)] != BINARY_MAGIC or view[4] != BINARY_VERSION:
+            raise ValueError('{} is not a version {} binary trace'.format(filename, BINARY_VERSION))
+
+        hasCores = view[5] & BINARY_CORES
+        record = BINARY_RECORDS[hasCores]
+
+        if len(records) % record.size:
+            raise ValueError('{} ends in the middle of a record'.format(filename))
+
+        if start:
+            skipped = records
+            records = records[start * record.size:]
+            skipped.release()
+
+        readCode = ord(READ)
+        writeCode = ord(WRITE)
+        fetchCode = ord(FETCH)
+        flushCode = ord(FLUSH)
+
+        unpacked = record.iter_unpack(records)
+
+        for number, fields in enumerate(unpacked, start + 1):
+            operation = fields[1]
+            core = fields[3] if hasCores else 0
+
+            if operation == readCode:
+                yield READ, fields[0], -1, core
+            elif operation == writeCode:
+                yield WRITE, fields[0], fields[2], core
+            elif operation == fetchCode:
+                yield FETCH, fields[0], -1, core
+            elif operation == flushCode:
+                yield FLUSH, -1, -1, core
+            else:
+                raise ValueError('{}: record {} has unknown operation 0x{:02X}'.format(filename, number, operation))
+    finally:
+        # The mapping can only close once nothing points into it
+        del unpacked
+        records.release()
+        view.release()
+        mapping.close()
+        ifs.close()
+
+def readBinaryStream(stream, filename):
+    ##
+    # Streams a binary trace that cannot be mapped (compressed or piped), reading a
+    #  fixed number of records at a time and unpacking them in place
+    # @param Stream - binary stream of the trace, closed at the end
+    # @param filename - of the trace file, for error messages
+    # @returns Generator of (operation, address, byte, core) per access
+
+    try:
+        header = stream.read(BINARY_HEADER_SIZE)
+
+        if header[:len(BINARY_MAGIC)] != BINARY_MAGIC or len(header) < BINARY_HEADER_SIZE or header[4] != BINARY_VERSION:
+            raise ValueError('{} is not a version {} binary trace'.format(filename, BINARY_VERSION))
+
+        hasCores = header[5] & BINARY_CORES
+        record = BINARY_RECORDS[hasCores]
+        chunkSize = record.size * BINARY_CHUNK_RECORDS
+
+        readCode = ord(READ)
+        writeCode = ord(WRITE)
+        fetchCode = ord(FETCH)
+        flushCode = ord(FLUSH)
+
+        # Bytes of a record split between two reads, and the records read before this chunk
+        leftover = b''
+        number = 0
+
+        while True:
+            chunk = stream.read(chunkSize)
+            if not chunk:
+                break
+
+            chunk = leftover + chunk if leftover else chunk
+            end = len(chunk) - len(chunk) % record.size
+            leftover = chunk[end:]
+
+            for number, fields in enumerate(record.iter_unpack(memoryview(chunk)[:end]), number + 1):
+                operation = fields[1]
+                core = fields[3] if hasCores else 0
+
+                if operation == readCode:
+                    yield READ, fields[0], -1, core
+                elif operation == writeCode:
+                    yield WRITE, fields[0], fields[2], core
+                elif operation == fetchCode:
+                    yield FETCH, fields[0], -1, core
+                elif operation == flushCode:
+                    yield FLUSH, -1, -1, core
+                else:
+                    raise ValueError('{}: record {} has unknown operation 0x{:02X}'.format(filename, number, operation))
+
+        if leftover:
+            raise ValueError('{} ends in the middle of a record'.format(filename))
+    finally:
+        stream.close()
+
+class PrefetchedTrace:
+    ##
+    # Runs a trace reader on a background thread, so reading, decompressing and parsing
+    #  the next accesses overlaps with simulating the current ones (the codecs let other
+    #  threads run while they decompress). Accesses are handed over in batches through a
+    #  queue holding at most depth batches, so memory stays bounded however long the trace
+
+    def __init__(self, accesses, batchSize=4096, depth=16):
+        ##
+        # Starts the background thread
+        # @param Accesses - generator of accesses, e.g. from readTrace
+        # @param BatchSize - accesses handed over at a time
+        # @param Depth - batches that may wait in the queue
+
+        self.accesses = accesses
+        self.batchSize = batchSize
+        self.batches = queue.Queue(depth)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.produce, daemon=True)
+        self.thread.start()
+
+    def hand(self, item):
+        ##
+        # Queues an item, giving up once the reader has stopped
+        # @param Item - a batch, an exception or None for the end
+        # @returns True if the item was queued
+
+        while not self.stopped.is_set():
+            try:
+                self.batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def produce(self):
+        ##
+        # Background thread: reads the accesses in batches. An error is handed over to be
+        #  raised in the simulating thread
+        # @returns None
+
+        try:
+            batch = []
+
+            for access in self.accesses:
+                batch.append(access)
+
+                if len(batch) == self.batchSize:
+                    if not self.hand(batch):
+                        return
+                    batch = []
+
+            if batch and not self.hand(batch):
+                return
+
+            self.hand(None)
+        except Exception as error:
+            self.hand(error)
+        finally:
+            self.accesses.close()
+
+    def __iter__(self):
+        ##
+        # @returns Generator of the accesses in trace order
+
+        try:
+            while True:
+                batch = self.batches.get()
+
+                if batch is None:
+                    return
+                if isinstance(batch, Exception):
+                    raise batch
+
+                yield from batch
+        finally:
+            self.close()
+
+    def close(self):
+        ##
+        # Stops the background thread
+        # @returns None
+
+        self.stopped.set()
+        self.thread.join()
+
+def writeBinaryTrace(filename, accesses, cores=True):
+    ##
+    # Packs accesses into a binary trace
+    # @param filename - of the binary trace to write
+    # @param Accesses - iterable of (operation, address, byte, core), e.g. from readTrace
+    # @param Cores - keep the core numbers (12 byte records instead of 10)
+    # @returns The number of accesses written
+
+    record = BINARY_RECORDS[cores]
+    pack = record.pack
+    count = 0
+
+    ofs = open(filename, 'wb', buffering=1 << 20)
+    ofs.write(BINARY_MAGIC + bytes([BINARY_VERSION, BINARY_CORES if cores else 0, 0, 0]))
+
+    try:
+        for operation, address, byte, core in accesses:
+            if cores:
+                ofs.write(pack(max(0, address), ord(operation), max(0, byte), core))
+            elif core:
+                raise ValueError('core {} cannot be written to a trace without core numbers'.format(core))
+            else:
+                ofs.write(pack(max(0, address), ord(operation), max(0, byte)))
+            count += 1
+    finally:
+        ofs.close()
+
+    return count
+
+def readDineroTrace(ifs, filename):
+    ##
+    # Streams a Dinero din trace: 'label address' per line, where the label is 0 for
+    #  a read, 1 for a write, 2 for an instruction fetch and 4 for a flush (3 is skipped).
+    #  Din traces carry no data, so writes store 0
+    # @param ifs - text stream of the trace, closed at the end
+    # @param filename - of the trace file, for error messages
+    # @returns Generator of (operation, address, byte, core) per access
+
+    try:
+        for lineNumber, line in enumerate(ifs, 1):
+            fields = line.split()
+
+            if not fields or fields[0] == '3':
+                continue
+
+            operation = DINERO_OPERATIONS.get(fields[0])
+
+            if operation is None:
+                raise ValueError('{}:{}: unknown Dinero label {}'.format(filename, lineNumber, fields[0]))
+
+            if operation == FLUSH:
+                yield FLUSH, -1, -1, 0
+            else:
+                yield operation, int(fields[1], 16), 0 if operation == WRITE else -1, 0
+    finally:
+        ifs.close()
+
+def readLackeyTrace(ifs, filename):
+    ##
+    # Streams the output of Valgrind's lackey tool (--trace-mem=yes): 'I', 'L', 'S' or
+    #  'M' then 'address,size' per line. A modify is a read then a write, each access is
+    #  made at its first address only and writes store 0. Valgrind's own '==' lines are skipped
+    # @param ifs - text stream of the trace, closed at the end
+    # @param filename - of the trace file, for error messages
+    # @returns Generator of (operation, address, byte, core) per access
+
+    try:
+        for lineNumber, line in enumerate(ifs, 1):
+            fields = line.split()
+
+            if not fields or fields[0].startswith('=='):
+                continue
+
+            if len(fields) != 2:
+                raise ValueError('{}:{}: lackey lines are a kind and address,size'.format(filename, lineNumber))
+
+            kind = fields[0]
+            address = int(fields[1].partition(',')[0], 16)
+
+            if kind == 'I':
+                yield FETCH, address, -1, 0
+            elif kind == 'L':
+                yield READ, address, -1, 0
+            elif kind == 'S':
+                yield WRITE, address, 0, 0
+            elif kind == 'M':
+                yield READ, address, -1, 0
+                yield WRITE, address, 0, 0
+            else:
+                raise ValueError('{}:{}: unknown lackey access {}'.format(filename, lineNumber, kind))
+    finally:
+        ifs.close()
+
+def decodeTrace(filename):
+    ##
+    # Reads a whole trace file into flat arrays, so it can be replayed many times
+    #  (or shared between processes) without parsing it again
+    # @param filename - of the trace file
+    # @returns Operations (bytearray of the operation letters), addresses (array of
+    #  unsigned 64 bit integers) and data bytes (bytearray, 0 where there is no byte)
+
+    operations = bytearray()
+    addresses = array('Q')
+    data = bytearray()
+
+    for operation, address, byte, core in readTrace(filename):
+        operations.append(ord(operation))
+        addresses.append(max(0, address))
+        data.append(max(0, byte))
+
+    return operations, addresses, data
+
+def main():
+    ##
+    # Converts a trace in any format to a binary trace
+
+    parser = argparse.ArgumentParser(description='Convert a trace to the binary trace format')
+    parser.add_argument('input', help='trace to convert')
+    parser.add_argument('output', help='binary trace to write')
+    parser.add_argument('--format', choices=TRACE_FORMATS,
+                        help='format of the input, guessed from its contents and extension by default')
+    parser.add_argument('--no-cores', action='store_true',
+                        help='leave out the core numbers of a single core trace')
+    arguments = parser.parse_args()
+
+    try:
+        count = writeBinaryTrace(arguments.output, readTrace(arguments.input, arguments.format),
+                                 not arguments.no_cores)
+    except ValueError as error:
+        raise SystemExit('Error, {}'.format(error))
+
+    print('accesses_written:{}'.format(count))
+
+if __name__ == "__main__":
+    main()
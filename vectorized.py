@@ -0,0 +1,172 @@
+# File: vectorized.py
+# Author(s): Trey Wells
+# Date: 11/28/2021
+# Section: 505
+# E-mail(s): wells.t.2024@tamu.edu
+# Description:
+#   This file contains a NumPy engine that works out the hits and misses of a
+#   direct-mapped cache over a whole trace at once
+
+from array import array
+import os
+
+from cache import CacheStats
+from tracefile import (readTrace, READ, WRITE, FLUSH, FETCH, BINARY_CORES, BINARY_HEADER_SIZE,
+                       BINARY_MAGIC, BINARY_VERSION)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def requireNumpy():
+    ##
+    # @returns None, raising ImportError when NumPy is not installed
+
+    if numpy is None:
+        raise ImportError('the vectorized engine needs NumPy')
+
+def readTraceArrays(filename):
+    ##
+    # Reads a trace into arrays. The records of an uncompressed binary trace are mapped
+    #  straight from the file without being parsed or copied
+    # @param filename - of the trace file, in any format readTrace takes
+    # @returns NumPy arrays of addresses (uint64) and write flags (bool)
+
+    requireNumpy()
+
+    # Compressed and piped traces have to be parsed
+    if filename != '-':
+        ifs = open(filename, 'rb')
+        magic = ifs.read(len(BINARY_MAGIC))
+        ifs.close()
+
+        if magic == BINARY_MAGIC:
+            return readBinaryArrays(filename)
+
+    addresses = array('Q')
+    writes = bytearray()
+
+    for operation, address, byte, core in readTrace(filename):
+        if operation == FLUSH:
+            raise ValueError('{}: the vectorized engine cannot replay cache-flush'.format(filename))
+
+        addresses.append(address)
+        writes.append(operation == WRITE)
+
+    return numpy.frombuffer(addresses, dtype=numpy.uint64), numpy.frombuffer(writes, dtype=numpy.bool_)
+
+def readBinaryArrays(filename):
+    ##
+    # @param filename - of a binary trace
+    # @returns NumPy arrays of addresses (uint64) and write flags (bool), the addresses
+    #  being a view of the memory-mapped file
+
+    header = numpy.fromfile(filename, dtype=numpy.uint8, count=BINARY_HEADER_SIZE)
+
+    if bytes(header[:len(BINARY_MAGIC)]) != BINARY_MAGIC or header[4] != BINARY_VERSION:
+        raise ValueError('{} is not a version {} binary trace'.format(filename, BINARY_VERSION))
+
+    fields = [('address', '<u8'), ('operation', 'u1'), ('data', 'u1')]
+    if header[5] & BINARY_CORES:
+        fields.append(('core', '<u2'))
+
+    # An empty mapping is not allowed, so a trace with no records gets empty arrays
+    if os.path.getsize(filename) == BINARY_HEADER_SIZE:
+        records = numpy.zeros(0, dtype=numpy.dtype(fields))
+    else:
+        records = numpy.memmap(filename, dtype=numpy.dtype(fields), mode='r', offset=BINARY_HEADER_SIZE)
+
+    if numpy.any(records['operation'] == ord(FLUSH)):
+        raise ValueError('{}: the vectorized engine cannot replay cache-flush'.format(filename))
+
+    unknown = numpy.flatnonzero(~numpy.isin(records['operation'], [ord(READ), ord(WRITE), ord(FETCH)]))
+    if len(unknown):
+        raise ValueError('{}: record {} has unknown operation 0x{:02X}'.format(
+            filename, unknown[0] + 1, records['operation'][unknown[0]]))
+
+    return records['address'], records['operation'] == ord(WRITE)
+
+def simulateDirectMapped(addresses, writes, cacheSize, blockSize,
+                         writeHitPolicy='write_back', writeMissPolicy='write_allocate'):
+    ##
+    # Works out what Cache would count for a direct-mapped cache over a whole trace.
+    # A set only ever holds the block of the last access that allocated in it, so an
+    #  access hits when that access had the same block. Sorting the trace by set (stably,
+    #  so each set keeps its order) puts that access right before it, or, when writes
+    #  do not allocate, at the last read before it
+    # @param Addresses - array of addresses
+    # @param Writes - array of write flags, or None for a read-only trace
+    # @param CacheSize - in bytes
+    # @param BlockSize - in bytes
+    # @param WriteHitPolicy - 'write_through' or 'write_back'
+    # @param WriteMissPolicy - 'write_allocate' or 'no_write_allocate'
+    # @returns CacheStats for the trace
+
+    requireNumpy()
+
+    if cacheSize < 1 or cacheSize & (cacheSize - 1) or blockSize < 1 or blockSize & (blockSize - 1):
+        raise ValueError('cache and block sizes must be powers of two')
+    if blockSize > cacheSize:
+        raise ValueError('the block size cannot be bigger than the cache itself.')
+
+    addresses = numpy.asarray(addresses, dtype=numpy.uint64)
+    if len(addresses) == 0:
+        return CacheStats(0, 0, 0, 0)
+
+    numberOfSets = cacheSize // blockSize
+    blocks = addresses >> numpy.uint64(blockSize.bit_length() - 1)
+
+    # Radix sort is used for set indexes of 16 bits or less
+    setDtype = numpy.uint16 if numberOfSets <= 1 << 16 else numpy.uint64
+    sets = (blocks & numpy.uint64(numberOfSets - 1)).astype(setDtype)
+
+    order = numpy.argsort(sets, kind='stable')
+    blocks = blocks[order]
+    sets = sets[order]
+
+    if writes is None:
+        writes = numpy.zeros(len(blocks), dtype=numpy.bool_)
+    else:
+        writes = numpy.asarray(writes, dtype=numpy.bool_)[order]
+
+    # Accesses that leave their block in the set whether they hit or not
+    if writeMissPolicy == 'write_allocate':
+        allocating = numpy.ones(len(blocks), dtype=numpy.bool_)
+    else:
+        allocating = ~writes
+
+    # Position of the last allocating access strictly before each access, -1 for none
+    positions = numpy.arange(len(blocks))
+    lastAllocating = numpy.maximum.accumulate(numpy.where(allocating, positions, -1))
+    previous = numpy.concatenate(([-1], lastAllocating[:-1]))
+
+    # The previous allocating access has to be in the same set for its block to still be there
+    safePrevious = numpy.maximum(previous, 0)
+    resident = (previous >= 0) & (sets[safePrevious] == sets)
+    hit = resident & (blocks[safePrevious] == blocks)
+
+    hits = int(numpy.count_nonzero(hit))
+    misses = len(blocks) - hits
+
+    # Every allocating miss fills the set; all but the first fill of each set evict a line
+    fills = allocating & ~hit
+    numberOfFills = int(numpy.count_nonzero(fills))
+    filledSets = len(numpy.unique(sets[fills]))
+    evictions = numberOfFills - filledSets
+
+    writeBacks = 0
+
+    if writeHitPolicy == 'write_back' and numberOfFills:
+        # Number every stay of a block in a set, then mark the stays that were written
+        #  to. A write lands in the current stay if it hit or allocated
+        stay = numpy.cumsum(fills) - 1
+        dirty = numpy.zeros(numberOfFills, dtype=numpy.bool_)
+        dirty[stay[writes & (hit | allocating)]] = True
+
+        # A dirty stay is written back when a later fill of the same set replaces it
+        fillSets = sets[fills]
+        replaced = numpy.concatenate((fillSets[1:] == fillSets[:-1], [False]))
+        writeBacks = int(numpy.count_nonzero(dirty & replaced))
+
+    return CacheStats(hits, misses, evictions, writeBacks)